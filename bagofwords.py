@@ -25,13 +25,41 @@ Parameters:
         - count= geeft terug hoe vaak alle tokens voorkomen als absolute waarde
         - frac= geeft terug hoe vaak alle tokens voorkomen als fractie
         - perc= geeft terug hoe vaak alle tokens voorkomen als percentage
+    <workers>              : Optioneel (-w), aantal processen waarover het leren van de tokens verdeeld wordt
+    --file_list            : Optioneel, bestand met de paden van de inputbestanden, één per regel
+    --stream               : Optioneel, verwerkt de documenten één voor één (out-of-core) en schrijft de encoding als
+                             sparse matrix naar 'BoW_results.bowb' (te openen met nlp.load_sparse), met de vocabulaire
+                             in 'BoW_results.encb'. Geschikt voor honderdduizenden documenten.
+    <enc>                  : Optioneel (-e), bestaande vocabulaire (.enc/.encb, bijv. van tokenizer.py learn of --stream)
+                             waarmee de documenten getokenized worden. Er wordt dan geen BPE geleerd (-m en -f worden
+                             genegeerd), zodat de vectoren van verschillende runs dezelfde kolommen hebben.
+    --index                : Optioneel, TF-IDF index waaraan de inputbestanden toegevoegd worden (of vervangen als ze er
+                             al in staan), zonder de andere documenten opnieuw te verwerken. De output bevat alle
+                             documenten in de index. Een nieuwe index vereist -e.
+    --remove               : Optioneel, documenten die uit de --index verwijderd worden
+    --query                : Optioneel, tekstbestand(en) waarvoor de -k meest gelijkende documenten uit de --index
+                             gezocht worden (cosine similarity van de TF-IDF vectoren). Per resultaat een regel met
+                             query, rang, document en score.
+    --format               : Optioneel, outputformaat: text (leesbare tabel in 'BoW_results.bow', default), of een sparse
+                             matrix (documenten x tokens) met de documentnamen en tokens erbij: bowb, npz, mtx (Matrix
+                             Market) of parquet. Te lezen met nlp.load_bow.
+    <output>               : Optioneel (-o), pad van het outputbestand
 
 Voorbeeld:
     python bagofwords.py input_file1.txt input_file2.txt -t freq/ -m 1000 -f 4 -c perc
+    python bagofwords.py --file_list abstracts.txt -t tfidf -m 1000 --stream
+    python bagofwords.py new_batch1.txt new_batch2.txt -t tfidf -e BoW_results.encb
+    python bagofwords.py new_batch1.txt -t tfidf -e BoW_results.encb --index corpus.tfidx
+    python bagofwords.py --index corpus.tfidx --query new_abstract.txt -k 10
+    python bagofwords.py input_file1.txt input_file2.txt -t tfidf --format npz -o vectors.npz
 
 """
-from nlp import file_merger,group_encoder,multi_hot_encoding,frequency_checker,tf_idf_calc
+from nlp import file_merger,group_encoder,multi_hot_encoding,frequency_checker,tf_idf_calc,filereader
+from nlp import word_type_counter,incremental_encoder,Tokenizer,save_vocab,stream_document_term_matrix,stream_bow_matrix,bow_matrix
+from nlp import TfIdfIndex,iter_words,matrix_to_df,SimilarityIndex,document_term_matrix,save_bow,load_bow,BOW_FORMATS
 import argparse
+import os
+import tempfile
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Bag of Words analyser",
@@ -52,31 +80,241 @@ def parse_args():
         "-t","--type_of_bag",
         choices=["multi", "freq", "tfidf"],
         type=str,
-        required=True,
-        help="type van bag_of_words resultaten"
+        default=None,
+        help="type van bag_of_words resultaten (verplicht, behalve bij --query)"
     )
     parser.add_argument(
         "input_files",
-        nargs="+",
+        nargs="*",
         help="input txt files"
         )
+    parser.add_argument(
+        "--file_list",
+        type=str,
+        default=None,
+        help="Tekstbestand met de paden van de inputbestanden, één per regel (voor veel documenten)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Verwerk de documenten één voor één en schrijf een sparse matrix naar schijf in plaats van een dataframe"
+    )
+    parser.add_argument(
+        "-e","--enc",
+        type=str,
+        default=None,
+        help="Bestaande vocabulaire (.enc of .encb) om de documenten mee te tokenizen, in plaats van een nieuwe BPE te leren"
+    )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default=None,
+        help="TF-IDF index (wordt aangemaakt als die nog niet bestaat) waar de inputbestanden aan toegevoegd worden"
+    )
+    parser.add_argument(
+        "--remove",
+        nargs="+",
+        default=[],
+        help="Documenten (bestandsnamen zoals in de index) die uit de --index verwijderd worden"
+    )
+    parser.add_argument(
+        "--query",
+        nargs="+",
+        default=[],
+        help="Tekstbestand(en) waarvoor de meest gelijkende documenten uit de --index gezocht worden"
+    )
+    parser.add_argument(
+        "-k","--top_k",
+        type=int,
+        default=5,
+        help="Aantal resultaten per query, default 5"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text"] + list(BOW_FORMATS),
+        default=None,
+        help="Outputformaat: text (tabel, default), bowb, npz, mtx (Matrix Market) of parquet; met --stream default bowb"
+    )
+    parser.add_argument(
+        "-o","--output",
+        type=str,
+        default=None,
+        help="Outputbestand, default 'BoW_results.bow' (of 'BoW_results.bowb' met --stream)"
+    )
     parser.add_argument("-c","--count_type",
                         type=str,
                         choices=["count", "frac", "perc"],
                         default="count",
                         help="type frequency analyse in getal fractie of percentage default is getal")
+    parser.add_argument(
+        "-w","--workers",
+        type=int,
+        default=1,
+        help="Aantal processen voor het leren van de tokens, default 1"
+    )
 
     return parser.parse_args()
 
-def df_printer(df):
+def df_printer(df,output_file="BoW_results.bow"):
     """
     Writes dataframe to txt
 
     param: pandas df
+    param: output_file, pad van het outputbestand
     """
-    with open("BoW_results.bow","w") as writer:
+    with open(output_file,"w") as writer:
         writer.write(df.to_string())
-    print("Output written to 'BoW_results.bow'")
+    print(f"Output written to '{output_file}'")
+
+def write_result(matrix,row_names,token_dict,fmt,output_file=None,type_o_b=None):
+    """
+    Schrijft een bag-of-words matrix (documenten x tokens) weg: als tabel met df_printer (fmt 'text') of
+    in een van de sparse formaten van nlp.save_bow, met de documentnamen en tokens erbij.
+
+    param: matrix, scipy.sparse matrix (documenten x tokens)
+    param: row_names [str, documentnamen]
+    param: token_dict {key, int token: value, str token strings}
+    param: fmt, 'text' of een van BOW_FORMATS
+    param: output_file, pad van het outputbestand, default 'BoW_results' met de extensie van het formaat
+    param: type_o_b, type bag of words, wordt bij bowb in de metadata opgeslagen
+    """
+    if fmt == "text":
+        df_printer(matrix_to_df(matrix,token_dict,row_names),output_file or "BoW_results.bow")
+        return
+    output_file = output_file or "BoW_results" + BOW_FORMATS[fmt]
+    save_bow(output_file,matrix,row_names,list(token_dict.values()),fmt,{"type": type_o_b})
+    print(f"Output written to '{output_file}'")
+
+def read_file_list(file_list):
+    """
+    Leest een bestand met paden van inputbestanden, één per regel (lege regels worden overgeslagen)
+
+    param: file_list, pad naar het bestand met paden
+    return: lijst met paden
+    """
+    with open(file_list,"r",encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def enc_tokenizer(enc_file):
+    """
+    Laadt een bestaande vocabulaire als Tokenizer (met de merges als die er zijn, anders greedy)
+
+    param: enc_file, pad naar het .enc of .encb bestand
+    return: tokenizer, token_dict {key, int token: value, str token strings}
+    """
+    tokenizer = Tokenizer.from_enc(enc_file)
+    return tokenizer, tokenizer.id_to_tok
+
+def tokenize_files(files,tokenizer):
+    """
+    Tokenized de bestanden met een vaste vocabulaire, karakters die niet in de vocabulaire staan worden overgeslagen
+
+    param: files [string filepaths]
+    param: tokenizer, Tokenizer met de vocabulaire
+    return: lijst[document] van lijsten[woorden in tokens]
+    """
+    return [[tokenizer.tokenize_known(w) for w in filereader(file_path)] for file_path in files]
+
+def update_index(files,index_file,enc_file=None,remove=()):
+    """
+    Werkt een TF-IDF index bij: verwijdert de documenten in remove en voegt de bestanden toe (een bestand
+    dat al in de index staat wordt vervangen). Alleen de tellingen van die documenten worden aangepast,
+    de rest van de index wordt niet opnieuw berekend. Een nieuwe index gebruikt de vocabulaire van enc_file,
+    een bestaande index de vocabulaire waarmee hij gemaakt is.
+
+    param: files [string filepaths]
+    param: index_file, pad naar de index
+    param: enc_file, vocabulaire (.enc/.encb), verplicht voor een nieuwe index
+    param: remove [string documentnamen]
+    return: de bijgewerkte TfIdfIndex
+    """
+    if os.path.exists(index_file):
+        index = TfIdfIndex.load(index_file)
+    elif enc_file:
+        _, token_dict = enc_tokenizer(enc_file)
+        index = TfIdfIndex(token_dict,os.path.abspath(enc_file))
+    else:
+        raise ValueError("een nieuwe index vereist --enc <vocabulaire>")
+
+    for name in remove:
+        index.remove(name)
+
+    if files:
+        tokenizer, _ = enc_tokenizer(index.enc_file)
+        for file_path in files:
+            if file_path in index:
+                index.remove(file_path)
+            index.add(file_path,[tokenizer.tokenize_known(w) for w in iter_words(file_path)])
+
+    index.save(index_file)
+    return index
+
+def query_index(index_file,query_files,k=5):
+    """
+    Zoekt voor elk querybestand de k documenten uit de index met de hoogste cosine similarity van de TF-IDF
+    vectoren. De query wordt getokenized met de vocabulaire van de index; de genormaliseerde index wordt
+    één keer opgebouwd en daarna voor alle queries gebruikt.
+
+    param: index_file, pad naar de TF-IDF index
+    param: query_files [string filepaths]
+    param: k, aantal resultaten per query
+    return: lijst van (querybestand, [(documentnaam, score)])
+    """
+    index = TfIdfIndex.load(index_file)
+    similarity = SimilarityIndex.from_index(index)
+    tokenizer, _ = enc_tokenizer(index.enc_file)
+
+    results = []
+    for query_file in query_files:
+        words = [tokenizer.tokenize_known(w) for w in iter_words(query_file)]
+        results.append((query_file, similarity.query(words,k)))
+    return results
+
+def stream_bow(files,max_tokens,min_freq,type_o_b,ct,workers,output_file,enc_file=None,fmt="bowb"):
+    """
+    Out-of-core bag of words: leert de vocabulaire op de unieke woorden van alle bestanden (zonder alle
+    woorden samen te voegen), tokenized daarna de documenten één voor één en schrijft ze als rijen van een
+    sparse matrix naar schijf, terwijl de tellingen per token en per document bijgehouden worden. In een
+    tweede doorgang wordt de matrix in blokken rijen omgezet naar de gekozen encoding en weggeschreven in
+    formaat fmt (zie nlp.save_bow), met de bestandsnamen en tokens erbij. De vocabulaire wordt naast de
+    output opgeslagen als .encb bestand.
+
+    Alleen bowb wordt direct in blokken geschreven, de andere formaten worden daarna vanuit een tijdelijk
+    bowb bestand (memory mapped) omgezet met save_bow.
+
+    Met enc_file wordt die vocabulaire gebruikt en wordt er niets geleerd of opgeslagen.
+    """
+    if enc_file:
+        tokenizer, token_dict = enc_tokenizer(enc_file)
+        vocab_file = enc_file
+    else:
+        word_counts = word_type_counter(files)
+        _, token_dict, merges = incremental_encoder(word_counts,max_tokens,min_freq,return_merges=True,workers=workers)
+        tokenizer = Tokenizer(token_dict,merges,strategy="merges")
+
+        vocab_file = os.path.splitext(output_file)[0] + ".encb"
+        save_vocab(vocab_file,token_dict,merges)
+
+    fd, dtm_file = tempfile.mkstemp(suffix=".dtm")
+    os.close(fd)
+    bow_file = output_file
+    if fmt != "bowb":
+        fd, bow_file = tempfile.mkstemp(suffix=".bowb")
+        os.close(fd)
+    try:
+        token_totals, doc_totals = stream_document_term_matrix(files,tokenizer,token_dict,dtm_file)
+        meta = {"type": type_o_b, "rows": list(files), "columns": [str(tok) for tok in token_dict.values()]}
+        stream_bow_matrix(dtm_file,bow_file,type_o_b,ct,token_totals,doc_totals,meta)
+        if fmt != "bowb":
+            result, rows, columns = load_bow(bow_file)
+            save_bow(output_file,result,rows,columns,fmt)
+            del result
+    finally:
+        os.remove(dtm_file)
+        if bow_file != output_file:
+            os.remove(bow_file)
+
+    print(f"Output written to '{output_file}' ({len(files)} documents x {len(token_dict)} tokens), vocabulary to '{vocab_file}'")
 
 def main():
     args = parse_args()
@@ -85,9 +323,69 @@ def main():
     files = args.input_files
     type_o_b = args.type_of_bag
     ct = args.count_type
-    
-    merged_words, len_of_files = file_merger(files)
-    uncoupled_token_list_of_lists, token_dict = group_encoder(max_tokens,min_freq,merged_words,len_of_files)
+
+    if args.query:
+        if not args.index or not os.path.exists(args.index):
+            print("Error: --query vereist een bestaande --index")
+            return
+        lines = []
+        for query_file, matches in query_index(args.index,args.query,args.top_k):
+            for rank, (name, score) in enumerate(matches, 1):
+                lines.append(f"{query_file}\t{rank}\t{name}\t{score:.6f}")
+        if args.output:
+            with open(args.output,"w") as writer:
+                writer.write("\n".join(lines) + "\n")
+            print(f"Output written to '{args.output}'")
+        else:
+            print("\n".join(lines))
+        return
+
+    if type_o_b is None:
+        print("Error: -t/--type_of_bag is verplicht (multi, freq of tfidf)")
+        return
+
+    if args.file_list:
+        files = files + read_file_list(args.file_list)
+    if not files and not (args.index and args.remove):
+        print("Error: geef inputbestanden op of gebruik --file_list")
+        return
+
+    if args.index:
+        try:
+            index = update_index(files,args.index,args.enc,args.remove)
+        except (ValueError, KeyError) as e:
+            print(f"Error: {e}")
+            return
+        print(f"Index '{args.index}' bevat {len(index)} documenten")
+        if type_o_b == "tfidf":
+            result = index.tf_idf()
+        else:
+            result = bow_matrix(index.counts_matrix(),type_o_b,ct)
+        write_result(result,index.names(),index.tokens_dict,args.format or "text",args.output,type_o_b)
+        return
+
+    if args.stream:
+        fmt = args.format or "bowb"
+        if fmt == "text":
+            print("Error: --stream schrijft een sparse matrix, kies --format bowb, npz, mtx of parquet")
+            return
+        stream_bow(files,max_tokens,min_freq,type_o_b,ct,args.workers,args.output or "BoW_results" + BOW_FORMATS[fmt],
+                   args.enc,fmt)
+        return
+
+    if args.enc:
+        # vaste vocabulaire: geen BPE leren, de documenten worden direct getokenized
+        tokenizer, token_dict = enc_tokenizer(args.enc)
+        uncoupled_token_list_of_lists = tokenize_files(files,tokenizer)
+    else:
+        merged_words, len_of_files = file_merger(files)
+        uncoupled_token_list_of_lists, token_dict = group_encoder(max_tokens,min_freq,merged_words,len_of_files,args.workers)
+
+    if args.format not in (None, "text"):
+        # sparse output: de matrix wordt direct weggeschreven, zonder dataframe
+        dtm = document_term_matrix(uncoupled_token_list_of_lists,token_dict)
+        write_result(bow_matrix(dtm,type_o_b,ct),files,token_dict,args.format,args.output,type_o_b)
+        return
 
     df = ""
 
@@ -105,7 +403,7 @@ def main():
     if type_o_b == "tfidf":
         df = tf_idf_calc(uncoupled_token_list_of_lists,token_dict,files)
 
-    df_printer(df)
+    df_printer(df,args.output or "BoW_results.bow")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
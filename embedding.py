@@ -1,11 +1,14 @@
 import os
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import sparse
 from sklearn.neural_network import MLPClassifier
 import matplotlib.pyplot as plt
 from collections import Counter
+from itertools import chain
 import warnings
 import argparse
-from nlp import load_tok_file, load_enc, build_token_mappings
+from nlp import load_tok_file, load_enc, build_token_mappings, build_id_lookup
 
 # Waarschuwing van sklearn niet weergeven aan gebruiker.
 # Bijvoorbeeld als er niet veel oefendata is, komt er een waarschuwing dat het model niet volledig convergeert.
@@ -15,7 +18,13 @@ warnings.filterwarnings("ignore", category=UserWarning)
 def build_dataset(tokenized_data, enc, token_to_idx, n=2):
     """
     Bouwt een dataset voor het trainen van een MLP (multi-layer perceptron) op basis van context rondom
-    een target token
+    een target token.
+
+    Alle sequenties worden achter elkaar in één numpy array gezet en met een sliding window van 2n + 1
+    tokens in één keer doorlopen; alleen vensters die helemaal binnen één sequentie vallen tellen mee.
+    X wordt een sparse matrix (alleen de contexttokens per rij), in plaats van een rij met nullen ter
+    grootte van de vocabulaire per trainingsvoorbeeld. MLPClassifier.fit accepteert die direct.
+
     Parameters:
         tokenized_data: lijsten van token-ID's
         enc: dict van token-id:token
@@ -23,58 +32,53 @@ def build_dataset(tokenized_data, enc, token_to_idx, n=2):
         n: grootte van context window (aan beide kanten van target token) met dfault 2
 
     Returns:
-        X: np array, matrix met one-hot gecodeerde contextfeatures voor elk trainingsvoorbeeld
+        X: scipy.sparse.csr_matrix, multi-hot gecodeerde contextfeatures voor elk trainingsvoorbeeld
         Y: np array met target labels (token-ID's verschoven naar 0-based indexering).
         token_counter: frequentie van elk targettoken binnen de dataset
     """
-    X, Y = [], []
     num_tokens = len(token_to_idx)
-    token_counter = Counter()
-
-    for seq in tokenized_data:
-        # Sequenties die te kort zijn voor een context van n links en n rechts overslaan
-        if len(seq) < 2*n + 1:
-            continue
-
-        # Doorloop tokens die een volledige context hebben
-        for i in range(n, len(seq) - n):
-            # Verzamel contexttokens links en rechts van de target
-            context_ids = seq[i-n:i] + seq[i+1:i+n+1]
-            # One-hot vector aanmaken op basis van alle mogelijke tokens
-            x_vec = np.zeros(num_tokens)
-            # Voor elke context-token de juiste index op 1 zetten
-            for t_id in context_ids:
-
-                # ID → tokenstring
-                if t_id not in enc:
-                    continue  # veiligheidscheck
-
-                tok = enc[t_id]  # bijvoorbeeld "er", "##ing", "c"
-
-                # Alleen verwerken als token bestaat in token_to_idx
-                if tok not in token_to_idx:
-                    continue
-
-                idx = token_to_idx[tok]
-                x_vec[idx] = 1
-
-                # Target ID → target tokenstring
-            target_id = seq[i]
-            if target_id not in enc:
-                continue
-
-            target_tok = enc[target_id]
-
-            # Target moet ook bestaan in mapping
-            if target_tok not in token_to_idx:
-                continue
-
-            # sklearn labels moeten ints zijn 0..N-1
-            Y.append(token_to_idx[target_tok])
-            X.append(x_vec)
-
-            token_counter[target_tok] += 1
-    return np.array(X), np.array(Y), token_counter
+    window = 2 * n + 1
+
+    lengths = np.fromiter(map(len, tokenized_data), dtype=np.int64, count=len(tokenized_data))
+    flat = np.fromiter(chain.from_iterable(tokenized_data), dtype=np.int64, count=int(lengths.sum()))
+
+    # Token-ID → index in de inputvector in één keer via een lookup-tabel, -1 als het token niet in enc
+    # of token_to_idx staat (ook voor ID's buiten de tabel)
+    lut = build_id_lookup(enc, token_to_idx)
+    columns = np.full(len(flat), -1, dtype=np.int64)
+    in_table = (flat >= 0) & (flat < len(lut))
+    columns[in_table] = lut[flat[in_table]]
+
+    if len(columns) < window:
+        return sparse.csr_matrix((0, num_tokens)), np.zeros(0, dtype=np.int64), Counter()
+
+    # Venster w bevat de tokens w..w+2n, de target staat in het midden (w + n)
+    windows = sliding_window_view(columns, window)
+    starts = np.cumsum(lengths) - lengths
+    seq_of_window = np.repeat(np.arange(len(lengths)), lengths)[:len(windows)]
+    # Het venster moet binnen zijn sequentie vallen (kortere sequenties vallen zo vanzelf af)
+    inside = np.arange(len(windows)) - starts[seq_of_window] + window <= lengths[seq_of_window]
+    windows = windows[inside]
+
+    # Target moet ook bestaan in mapping
+    windows = windows[windows[:, n] >= 0]
+    Y = windows[:, n].copy()
+
+    # Contexttokens links en rechts van de target, onbekende tokens overslaan
+    context = np.delete(windows, n, axis=1)
+    rows = np.repeat(np.arange(len(windows)), 2 * n)
+    cols = context.ravel()
+    known = cols >= 0
+    X = sparse.csr_matrix((np.ones(known.sum()), (rows[known], cols[known])), shape=(len(windows), num_tokens))
+    # Een token dat twee keer in de context staat telt één keer (multi-hot)
+    X.sum_duplicates()
+    X.data[:] = 1
+
+    # Frequentie van elk targettoken: tellen per index, daarna terug naar de tokenstring
+    idx_to_token = {idx: tok for tok, idx in token_to_idx.items()}
+    counts = np.bincount(Y, minlength=num_tokens)
+    token_counter = Counter({idx_to_token[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()})
+    return X, Y, token_counter
 
 
 def train_mlp(X, Y, hidden_size):
@@ -82,7 +86,7 @@ def train_mlp(X, Y, hidden_size):
     Traint een MLP (multi-layer perceptron) op basis van de gegenereerde dataset.
 
     Parameters:
-        X: np array, matrix met one-hot gecodeerde contextfeatures voor elk trainingsvoorbeeld.
+        X: sparse matrix (of np array) met multi-hot gecodeerde contextfeatures voor elk trainingsvoorbeeld.
         Y: np array met target labels (token-ID's verschoven naar 0-based indexering).
         hidden_size: aantal neuronen in verborgen laag (door user te kiezen) default is 50
 
@@ -189,7 +193,7 @@ def main():
 
     # Dataset bouwen
     X, Y, token_counter = build_dataset(tokenized_data, enc, token_to_idx, args.window)
-    if X.size == 0:
+    if X.shape[0] == 0:
         print("Dataset te klein voor de gegeven window size.")
         return
 
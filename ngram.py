@@ -8,6 +8,21 @@ gebruiken om nieuwe tekst te genereren.
 
 Gebruik (command line):
     python ngram.py <input_file1.tok> [<input_file2.tok> ...] -e <file.enc> -n <n> -l <length> -o <output_file>
+        (oude aanroep, gelijk aan 'run'; het eerste inputbestand moet op .tok of .tokb eindigen)
+    python ngram.py train <input_file1.tok> [<input_file2.tok> ...] -n <n> -o <model_file> [-e <file.enc>]
+    python ngram.py generate <model_file> -l <length> -o <output_file> [-e <file.enc>]
+    python ngram.py evaluate <model_file> <heldout1.tok> [<heldout2.tok> ...]
+
+Met train worden de ngrammen één keer geteld en opgeslagen in een binair modelbestand, generate laadt
+dat bestand (met memory mapping) en genereert er tekst mee, zonder de .tok bestanden opnieuw te lezen.
+
+Met evaluate wordt de log-likelihood en perplexity van held-out .tok bestanden berekend onder een
+model getraind met --backoff (interpolated absolute discounting over alle contextlengtes), in stukken
+zodat ook bestanden groter dan het geheugen gescoord kunnen worden. Tekst genereren met een
+--backoff model gebeurt met stupid backoff (alpha 0.4 per stap naar een kortere context).
+
+Met --num_samples K worden K teksten met hetzelfde model gegenereerd (eventueel met --workers processen,
+elk sample met een eigen random stream) en weggeschreven in één bestand, één per regel of als JSON lines.
 
 Parameters:
     <input.tok>    : Input tokenbestand(en), bevatten inputtekst die door de tokenizer is omgezet naar tokens
@@ -15,15 +30,32 @@ Parameters:
     <n>            : Lengte van de n-gram
     <length>       : Lengte van de te genereren tekst
     <output_file>  : Pad waar de gegenereerde tekst wordt opgeslagen
+    --counting     : Optioneel, ngrammen tellen met numpy (default, gevectoriseerd) of python (fallback)
+    --seed         : Optioneel, seed voor reproduceerbare tekst
+    --backoff      : Optioneel, model met alle ngramlengtes dat terugvalt op kortere contexten (NgramTrie)
+    --num_samples  : Optioneel, aantal te genereren teksten (één per regel in het outputbestand)
+    --workers      : Optioneel, aantal processen voor --num_samples
+    --format       : Optioneel, outputformaat voor --num_samples: lines (default) of jsonl
 
 Voorbeeld:
     python ngram.py gutenberg_cancer.tok -e gutenberg_cancer.enc -n 3 -l 100 -o output.txt
+    python ngram.py train gutenberg_cancer.tok -e gutenberg_cancer.enc -n 3 -o gutenberg_cancer.ngm
+    python ngram.py generate gutenberg_cancer.ngm -l 100 -o output.txt
+    python ngram.py generate gutenberg_cancer.ngm -l 100 -o samples.jsonl -k 1000 -w 4 --format jsonl
+    python ngram.py train gutenberg_cancer.tok -n 3 -o backoff.ngm --backoff
+    python ngram.py evaluate backoff.ngm kanker_wiki.tok
 """
 
 import argparse
+import json
+import os
+import sys
 from collections import Counter, defaultdict
+from multiprocessing import Pool
 from random import choices
-from nlp import filereader, load_enc, decode
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from nlp import filereader, load_enc, decode, is_tok_bin, load_tok_bin, save_arrays, load_arrays
 
 
 def determine_probability(tokens, n):
@@ -128,6 +160,846 @@ def generate_text(n, tokens, text_len, probability_dict, ngram_counts):
 
         return sequence
 
+def load_token_stream(tok_files):
+    """
+    Lees één of meer .tok bestanden (tekst of binair) in als één doorlopende reeks token-ID's.
+
+    :param tok_files: lijst met paden naar .tok bestanden
+    :return: numpy array (int64) met alle token-ID's achter elkaar
+    """
+    streams = []
+    for token_file in tok_files:
+        if is_tok_bin(token_file):
+            streams.append(np.asarray(load_tok_bin(token_file).tokens, dtype=np.int64))
+        else:
+            words = filereader(token_file)
+            streams.append(np.fromiter(map(int, words), dtype=np.int64, count=len(words)))
+    if not streams:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(streams)
+
+
+def iter_token_chunks(tok_file, chunk_size=1 << 20):
+    """
+    Lees een .tok bestand (tekst of binair) in stukken van ongeveer chunk_size token-ID's, zodat
+    bestanden die groter zijn dan het geheugen verwerkt kunnen worden.
+
+    :param tok_file: pad naar het .tok bestand
+    :param chunk_size: aantal token-ID's per stuk (bij tekst een schatting)
+    :return: generator met numpy arrays (int64) met token-ID's
+    """
+    if is_tok_bin(tok_file):
+        tokens = load_tok_bin(tok_file).tokens
+        for start in range(0, len(tokens), chunk_size):
+            yield np.asarray(tokens[start:start + chunk_size], dtype=np.int64)
+        return
+
+    with open(tok_file, "r", encoding="utf-8") as f:
+        while True:
+            # readlines stopt na ongeveer zoveel tekens, een token-ID met spatie is meestal ~4 tekens
+            lines = f.readlines(chunk_size * 4)
+            if not lines:
+                break
+            yield np.fromiter(map(int, "".join(lines).split()), dtype=np.int64)
+
+
+def pack_base(tokens, n):
+    """
+    Bepaal het grondtal waarmee ngrammen als één integer worden opgeslagen (hoogste token-ID + 1).
+
+    :param tokens: numpy array met token-ID's
+    :param n: int dat aangeeft hoe lang de ngrammen zijn
+    :return: het grondtal
+    """
+    return int(tokens.max()) + 1 if len(tokens) else 1
+
+
+def key_dtype(base, n):
+    """
+    Het dtype van de keys van ngrammen van lengte n + 1 (context + volgend token): int64 als ze daarin
+    passen, anders object (Python ints, die geen maximum hebben). Met object keys werkt alles hetzelfde,
+    alleen langzamer, zodat een grote n of een grote vocabulaire niet tot een overflow leidt.
+    """
+    return np.int64 if base ** (n + 1) < 2 ** 63 else object
+
+
+def count_ngrams(tokens, n, base):
+    """
+    Tel alle ngrammen van lengte n + 1 (context van n tokens plus het volgende token). Elk ngram wordt
+    als één integer opgeslagen: t0 * base^n + t1 * base^(n-1) + ... + tn, zodat sorteren op de key
+    hetzelfde is als sorteren op het ngram.
+
+    Dit is de oorspronkelijke telling met een Counter over alle ngrammen (--counting python). Ze blijft
+    alleen als fallback en ter controle van count_ngrams_numpy, die sneller is en minder geheugen gebruikt.
+
+    :param tokens: numpy array met token-ID's
+    :param n: int dat aangeeft hoe lang de ngrammen zijn
+    :param base: grondtal, zie pack_base
+    :return: gesorteerde keys en de bijbehorende tellingen (numpy arrays)
+    """
+    counts = Counter()
+    mod = base ** n
+    key = 0
+    # Schuif een venster van n + 1 tokens over de tekst en houd de key bij
+    for i, tok in enumerate(tokens.tolist()):
+        key = (key % mod) * base + tok
+        if i >= n:
+            counts[key] += 1
+
+    keys = np.fromiter(counts.keys(), dtype=key_dtype(base, n), count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    order = np.argsort(keys)
+    return keys[order], values[order]
+
+
+def count_ngrams_numpy(tokens, n, base):
+    """
+    Tel alle ngrammen van lengte n + 1 zoals count_ngrams, maar gevectoriseerd: een sliding window
+    view over de tokens geeft alle vensters zonder kopie, elk venster wordt met één bewerking per
+    kolom omgezet naar zijn key en np.unique telt de keys.
+
+    Als de keys niet in een int64 passen (zie key_dtype) telt np.unique de vensters zelf als rijen en
+    worden alleen de verschillende ngrammen omgezet naar een key als Python int.
+
+    :param tokens: numpy array met token-ID's
+    :param n: int dat aangeeft hoe lang de ngrammen zijn
+    :param base: grondtal, zie pack_base
+    :return: gesorteerde keys en de bijbehorende tellingen (numpy arrays)
+    """
+    tokens = np.asarray(tokens, dtype=np.int64)
+    dtype = key_dtype(base, n)
+    if len(tokens) <= n:
+        return np.zeros(0, dtype=dtype), np.zeros(0, dtype=np.int64)
+
+    windows = sliding_window_view(tokens, n + 1)
+    if dtype is object:
+        # np.unique op de rijen sorteert de ngrammen net als hun keys
+        rows, counts = np.unique(windows, axis=0, return_counts=True)
+        keys = np.zeros(len(rows), dtype=object)
+        for j in range(n + 1):
+            keys = keys * base + rows[:, j].astype(object)
+        return keys, counts.astype(np.int64)
+
+    keys = np.zeros(len(windows), dtype=np.int64)
+    for j in range(n + 1):
+        keys *= base
+        keys += windows[:, j]
+    keys, counts = np.unique(keys, return_counts=True)
+    return keys, counts.astype(np.int64)
+
+
+# Magic bytes van een opgeslagen ngram model (zie save_model)
+MODEL_MAGIC = b"NLPNGRM1"
+
+
+class NgramStore:
+    """
+    Compacte opslag van de ngram-tellingen in numpy arrays, in plaats van een Counter met tuples, een
+    defaultdict(Counter) en een dict met kansen.
+
+    Elke context (ngram van n tokens) is één integer key. context_keys is gesorteerd, zodat een context
+    met binary search gevonden wordt. De tokens die op een context volgen staan CSR-achtig in
+    next_tokens/next_counts: voor context i in offsets[i]:offsets[i + 1].
+
+    Attributen:
+        n : lengte van de context
+        base : grondtal van de keys (hoogste token-ID + 1)
+        context_keys : gesorteerde keys van alle contexten die een volgend token hebben
+        context_counts : hoe vaak elke context voorkomt (met een volgend token), zoals ngram_counts
+        offsets : start van de opvolgers van elke context in next_tokens (lengte aantal contexten + 1)
+        next_tokens : token-ID's van de opvolgers
+        next_counts : hoe vaak elke opvolger na de context voorkomt
+        unigram_counts : hoe vaak elk token-ID in de hele tekst voorkomt
+    """
+
+    def __init__(self, n, base, context_keys, context_counts, offsets, next_tokens, next_counts, unigram_counts):
+        self.n = n
+        self.base = base
+        self.context_keys = context_keys
+        self.context_counts = context_counts
+        self.offsets = offsets
+        self.next_tokens = next_tokens
+        self.next_counts = next_counts
+        self.unigram_counts = unigram_counts
+        # Cumulatieve tellingen voor de sampler, worden pas berekend als ze nodig zijn (of uit het model geladen)
+        self.cum = None
+
+    @classmethod
+    def from_tokens(cls, tokens, n, counting="numpy"):
+        """
+        Tel de ngrammen in een reeks token-ID's en bouw de store.
+
+        :param tokens: numpy array met token-ID's
+        :param n: int dat aangeeft hoe lang de ngrammen zijn
+        :param counting: 'numpy' (gevectoriseerd, count_ngrams_numpy) of 'python' (count_ngrams)
+        """
+        base = pack_base(tokens, n)
+        if counting == "numpy":
+            keys, counts = count_ngrams_numpy(tokens, n, base)
+        else:
+            keys, counts = count_ngrams(tokens, n, base)
+        return cls.from_counts(n, base, keys, counts, np.bincount(tokens, minlength=base))
+
+    @classmethod
+    def from_counts(cls, n, base, keys, counts, unigram_counts):
+        """
+        Bouw de store uit de gesorteerde keys en tellingen van alle ngrammen van lengte n + 1.
+        """
+        contexts = keys // base
+        context_keys, starts = np.unique(contexts, return_index=True)
+        offsets = np.append(starts, len(keys)).astype(np.int64)
+        if len(starts):
+            context_counts = np.add.reduceat(counts, starts)
+        else:
+            context_counts = np.zeros(0, dtype=np.int64)
+        next_tokens = (keys % base).astype(np.int32)
+        return cls(n, base, context_keys, context_counts, offsets, next_tokens, counts, unigram_counts)
+
+    def __len__(self):
+        return len(self.context_keys)
+
+    def cumulative(self):
+        """
+        Geef de cumulatieve sommen van context_counts, next_counts en unigram_counts (voor NgramSampler).
+        """
+        if self.cum is None:
+            self.cum = (np.cumsum(self.context_counts), np.cumsum(self.next_counts), np.cumsum(self.unigram_counts))
+        return self.cum
+
+    def key(self, ngram):
+        """
+        Zet een ngram (tuple van token-ID's) om naar zijn key.
+        """
+        key = 0
+        for tok in ngram:
+            key = key * self.base + int(tok)
+        return key
+
+    def ngram(self, key):
+        """
+        Zet een key terug om naar het ngram (tuple van token-ID's).
+        """
+        key = int(key)
+        toks = []
+        for _ in range(self.n):
+            key, tok = divmod(key, self.base)
+            toks.append(tok)
+        return tuple(reversed(toks))
+
+    def find(self, ngram):
+        """
+        Zoek de index van een context, of -1 als de context niet (met een volgend token) voorkomt.
+        """
+        if any(tok >= self.base for tok in ngram):
+            return -1
+        key = self.key(ngram)
+        i = int(np.searchsorted(self.context_keys, key))
+        if i < len(self.context_keys) and self.context_keys[i] == key:
+            return i
+        return -1
+
+    def __contains__(self, ngram):
+        return self.find(ngram) >= 0
+
+    def successors(self, ngram):
+        """
+        Geef de tokens die op een context volgen met hun tellingen (lege arrays als de context niet voorkomt).
+        """
+        i = self.find(ngram)
+        if i < 0:
+            return self.next_tokens[:0], self.next_counts[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.next_tokens[start:end], self.next_counts[start:end]
+
+    def sampler(self, seed=None):
+        return NgramSampler(self, seed)
+
+    def to_arrays(self):
+        """
+        Geef de arrays en meta-informatie om de store op te slaan (zie save_model).
+        """
+        context_cum, next_cum, unigram_cum = self.cumulative()
+        context_keys = self.context_keys
+        if context_keys.dtype == object:
+            # Python ints als bytes van vaste lengte (big-endian, zodat de volgorde gelijk blijft)
+            width = max((self.base ** self.n - 1).bit_length() + 7, 8) // 8
+            context_keys = np.frombuffer(b"".join(int(k).to_bytes(width, "big") for k in context_keys),
+                                         dtype=f"V{width}")
+        arrays = {
+            "context_keys": context_keys,
+            "context_counts": self.context_counts,
+            "offsets": self.offsets,
+            "next_tokens": self.next_tokens,
+            "next_counts": self.next_counts,
+            "unigram_counts": self.unigram_counts,
+            "context_cum": context_cum,
+            "next_cum": next_cum,
+            "unigram_cum": unigram_cum,
+        }
+        return arrays, {"kind": "ngram", "n": self.n, "base": self.base}
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        context_keys = arrays["context_keys"]
+        if context_keys.dtype.kind == "V":
+            context_keys = np.array([int.from_bytes(k.tobytes(), "big") for k in context_keys], dtype=object)
+        store = cls(meta["n"], meta["base"], context_keys, arrays["context_counts"], arrays["offsets"],
+                    arrays["next_tokens"], arrays["next_counts"], arrays["unigram_counts"])
+        store.cum = (arrays["context_cum"], arrays["next_cum"], arrays["unigram_cum"])
+        return store
+
+
+class NgramSampler:
+    """
+    Trekt tokens uit een NgramStore met vooraf berekende cumulatieve tellingen, zodat elke trekking
+    één binary search is (O(log) in plaats van lijsten met keys en weights opbouwen per token).
+
+    De cumulatieve som van next_counts loopt door over alle contexten: de opvolgers van context i
+    beslaan het stuk [offsets[i], offsets[i + 1]). Een getal dat uniform getrokken wordt tussen de
+    cumulatieve som aan het begin en aan het eind van dat stuk valt in een opvolger met kans
+    evenredig aan zijn telling, net als bij random.choices met de tellingen als weights.
+
+    :param store: NgramStore met de tellingen
+    :param seed: seed voor de random generator, zodat uitkomsten reproduceerbaar zijn (optioneel)
+    """
+
+    def __init__(self, store, seed=None):
+        self.store = store
+        self.rng = np.random.default_rng(seed)
+        self.context_cum, self.next_cum, self.unigram_cum = store.cumulative()
+        # Om de key van de volgende context te maken: eerste token eraf, nieuw token erachter
+        self.shift = store.base ** (store.n - 1)
+        self.buffer = []
+
+    def uniform(self):
+        """
+        Eén uniform getal in [0, 1), in blokken getrokken omdat losse trekkingen uit numpy traag zijn.
+        """
+        if not self.buffer:
+            self.buffer = self.rng.random(4096).tolist()
+        return self.buffer.pop()
+
+    def draw(self, cum, lo, hi):
+        """
+        Kies een index in [lo, hi) met kans evenredig aan het gewicht (cum[i] - cum[i - 1]).
+        """
+        start = cum[lo - 1] if lo > 0 else 0
+        u = start + int(self.uniform() * (cum[hi - 1] - start))
+        return int(np.searchsorted(cum, u, side="right"))
+
+    def find(self, key):
+        """
+        Index van de context met deze key, of -1 als die geen opvolgers heeft.
+        """
+        keys = self.store.context_keys
+        i = int(np.searchsorted(keys, key))
+        if i < len(keys) and keys[i] == key:
+            return i
+        return -1
+
+    def generate(self, text_len):
+        """
+        Genereer willekeurige tekst, op dezelfde manier als generate_text: begin met een context gekozen
+        naar hoe vaak die voorkomt en kies telkens een volgend token naar hoe vaak het na de huidige
+        context voorkomt. Als de context geen opvolgers heeft wordt een nieuwe context gekozen.
+
+        :param text_len: Gewenste lengte van de te genereren tekst
+        :return: lijst met token-ID's
+        """
+        store = self.store
+
+        # genereer tekst voor unigrams: een starttoken en text_len tokens, los gekozen naar hoe vaak ze voorkomen
+        if store.n == 1:
+            u = self.rng.random(text_len + 1) * self.unigram_cum[-1]
+            return np.searchsorted(self.unigram_cum, u.astype(np.int64), side="right").tolist()
+
+        current = self.draw(self.context_cum, 0, len(store))
+        key = int(store.context_keys[current])
+        sequence = list(store.ngram(key))
+
+        for _ in range(text_len - store.n):
+            current = self.find(key)
+            # als de context geen opvolgers heeft (bijv. het einde van de tekst) kies een nieuwe context
+            if current < 0:
+                current = self.draw(self.context_cum, 0, len(store))
+                key = int(store.context_keys[current])
+
+            j = self.draw(self.next_cum, store.offsets[current], store.offsets[current + 1])
+            next_word = int(store.next_tokens[j])
+
+            sequence.append(next_word)
+            key = (key % self.shift) * store.base + next_word
+
+        return sequence
+
+
+class NgramTrie:
+    """
+    Alle ngrammen van lengte 1 tot en met n + 1 in één trie van numpy arrays, voor een model dat bij een
+    onbekende context terugvalt (backoff) op een kortere context in plaats van opnieuw te beginnen.
+
+    Laag k bevat alle ngrammen van lengte k, gesorteerd. Per ngram wordt alleen het laatste token en de
+    telling opgeslagen: het begin van het ngram is de ouder in laag k - 1. De kinderen van ngram i in
+    laag k (de ngrammen van één token langer met hetzelfde begin) staan aaneengesloten in laag k + 1, in
+    offsets[k][i]:offsets[k][i + 1], dus de gedeelde prefixen worden maar één keer opgeslagen. De kinderen
+    van de wortel (laag 0, de lege context) zijn alle ngrammen van laag 1.
+
+    Attributen:
+        n : lengte van de langste context
+        base : grondtal van de keys tijdens het tellen (hoogste token-ID + 1)
+        tokens : per laag het laatste token van elk ngram (tokens[0] is leeg)
+        counts : per laag hoe vaak elk ngram voorkomt (counts[0] bevat het aantal tokens)
+        offsets : per laag 0..n het begin van de kinderen van elk ngram in de volgende laag
+    """
+
+    def __init__(self, n, base, tokens, counts, offsets):
+        self.n = n
+        self.base = base
+        self.tokens = tokens
+        self.counts = counts
+        self.offsets = offsets
+        # Cumulatieve tellingen per laag voor de sampler (of uit het model geladen)
+        self.cum = None
+        # Zoeksleutels per laag voor log_probs, worden pas berekend als ze nodig zijn
+        self.lookup = None
+
+    @classmethod
+    def from_tokens(cls, tokens, n, counting="numpy"):
+        """
+        Tel de ngrammen van alle lengtes 1..n + 1 in een reeks token-ID's en bouw de trie.
+
+        :param tokens: numpy array met token-ID's
+        :param n: lengte van de langste context
+        :param counting: 'numpy' (gevectoriseerd, count_ngrams_numpy) of 'python' (count_ngrams)
+        """
+        base = pack_base(tokens, n)
+        count = count_ngrams_numpy if counting == "numpy" else count_ngrams
+
+        levels_tokens = [np.zeros(0, dtype=np.int32)]
+        levels_counts = [np.array([len(tokens)], dtype=np.int64)]
+        offsets = []
+        parent_keys = np.zeros(1, dtype=np.int64)
+        for k in range(1, n + 2):
+            keys, counts = count(tokens, k - 1, base)
+            # Elk ngram hoort bij het ngram zonder zijn laatste token, beide lagen zijn gesorteerd
+            parents = np.searchsorted(parent_keys, keys // base)
+            offsets.append(np.searchsorted(parents, np.arange(len(parent_keys) + 1)).astype(np.int64))
+            levels_tokens.append((keys % base).astype(np.int32))
+            levels_counts.append(counts)
+            parent_keys = keys
+        offsets.append(np.zeros(len(parent_keys) + 1, dtype=np.int64))
+        return cls(n, base, levels_tokens, levels_counts, offsets)
+
+    def __len__(self):
+        return sum(len(t) for t in self.tokens)
+
+    def cumulative(self):
+        """
+        Geef per laag de cumulatieve som van de tellingen (voor BackoffSampler).
+        """
+        if self.cum is None:
+            self.cum = [np.cumsum(c) for c in self.counts]
+        return self.cum
+
+    def children(self, level, i):
+        """
+        Geef het bereik [lo, hi) van de kinderen van ngram i uit laag level in laag level + 1.
+        """
+        return int(self.offsets[level][i]), int(self.offsets[level][i + 1])
+
+    def child(self, level, i, tok):
+        """
+        Zoek het ngram dat ontstaat door tok achter ngram i uit laag level te zetten: de index in laag
+        level + 1, of -1 als dat ngram niet voorkomt. Eén binary search binnen de kinderen.
+        """
+        lo, hi = self.children(level, i)
+        if lo == hi:
+            return -1
+        tokens = self.tokens[level + 1]
+        j = lo + int(np.searchsorted(tokens[lo:hi], tok))
+        if j < hi and tokens[j] == tok:
+            return j
+        return -1
+
+    def find(self, ngram):
+        """
+        Zoek een ngram (tuple van token-ID's) door vanaf de wortel af te dalen: (laag, index) of None.
+        """
+        i = 0
+        for level, tok in enumerate(ngram):
+            i = self.child(level, i, tok)
+            if i < 0:
+                return None
+        return len(ngram), i
+
+    def __contains__(self, ngram):
+        return self.find(ngram) is not None
+
+    def ngram(self, level, i):
+        """
+        Zet ngram i uit laag level terug om naar een tuple van token-ID's door de ouders op te zoeken.
+        """
+        toks = []
+        while level > 0:
+            toks.append(int(self.tokens[level][i]))
+            level -= 1
+            i = int(np.searchsorted(self.offsets[level], i, side="right")) - 1
+        return tuple(reversed(toks))
+
+    def sampler(self, seed=None, alpha=0.4):
+        return BackoffSampler(self, seed, alpha)
+
+    def lookup_keys(self, level):
+        """
+        Gesorteerde zoeksleutels van laag level: index van de ouder * base + laatste token. Hiermee kan het
+        kind van veel ngrammen tegelijk met één np.searchsorted gevonden worden (zie log_probs).
+        """
+        if self.lookup is None:
+            self.lookup = {}
+        if level not in self.lookup:
+            parents = np.repeat(np.arange(len(self.offsets[level - 1]) - 1, dtype=np.int64), np.diff(self.offsets[level - 1]))
+            self.lookup[level] = parents * self.base + self.tokens[level]
+        return self.lookup[level]
+
+    def log_probs(self, tokens, start=0, discount=0.75):
+        """
+        Bereken gevectoriseerd de log-kans (natuurlijke log) van elk token gegeven de tokens ervoor, met
+        interpolated absolute discounting over alle contexten van lengte 0..n:
+
+            P(w | c) = max(c(c w) - D, 0) / c(c) + D * N(c) / c(c) * P(w | c zonder eerste token)
+
+        met N(c) het aantal verschillende opvolgers van c. Een context zonder opvolgers valt terug op de
+        kortere context. Onderaan staat add-one smoothing over alle token-ID's, zodat onbekende tokens
+        geen kans 0 krijgen.
+
+        :param tokens: numpy array met token-ID's
+        :param start: alleen de log-kansen vanaf deze positie teruggeven (de tokens ervoor zijn context)
+        :param discount: D, tussen 0 en 1
+        :return: numpy array met de log-kans van tokens[start:]
+        """
+        tokens = np.asarray(tokens, dtype=np.int64)
+        m = len(tokens)
+        cum = self.cumulative()
+        known = tokens < self.base
+
+        # nodes[k][i]: index in laag k van het ngram van lengte k dat eindigt op positie i, of -1
+        nodes = [np.zeros(m, dtype=np.int64)]
+        for k in range(1, self.n + 2):
+            parents = np.zeros(m, dtype=np.int64)
+            if k > 1:
+                parents[0] = -1
+                parents[1:] = nodes[k - 1][:-1]
+            keys = self.lookup_keys(k)
+            query = parents * self.base + tokens
+            j = np.minimum(np.searchsorted(keys, query), max(len(keys) - 1, 0))
+            found = (parents >= 0) & known & (keys[j] == query) if len(keys) else np.zeros(m, dtype=bool)
+            nodes.append(np.where(found, j, -1))
+
+        def counts_at(level, idx):
+            return np.where(idx >= 0, self.counts[level][np.maximum(idx, 0)], 0) if len(self.counts[level]) else np.zeros(m)
+
+        total = int(self.counts[0][0])
+        prob = (counts_at(1, nodes[1]) + 1) / (total + self.base)
+
+        for k in range(1, self.n + 1):
+            # context van lengte k: het ngram van lengte k dat eindigt op het vorige token
+            context = np.full(m, -1, dtype=np.int64)
+            context[1:] = nodes[k][:-1]
+            safe = np.maximum(context, 0)
+            lo = self.offsets[k][safe]
+            hi = self.offsets[k][safe + 1]
+            types = hi - lo
+            has = (context >= 0) & (types > 0)
+            seen = cum[k + 1][np.maximum(hi - 1, 0)] - np.where(lo > 0, cum[k + 1][np.maximum(lo - 1, 0)], 0)
+            seen = np.where(has, seen, 1)
+            higher = np.maximum(counts_at(k + 1, nodes[k + 1]) - discount, 0) / seen + discount * types / seen * prob
+            prob = np.where(has, higher, prob)
+
+        return np.log(prob[start:])
+
+    def to_arrays(self):
+        """
+        Geef de arrays en meta-informatie om de trie op te slaan (zie save_model).
+        """
+        arrays = {}
+        for k, cum in enumerate(self.cumulative()):
+            arrays[f"tokens_{k}"] = self.tokens[k]
+            arrays[f"counts_{k}"] = self.counts[k]
+            arrays[f"offsets_{k}"] = self.offsets[k]
+            arrays[f"cum_{k}"] = cum
+        return arrays, {"kind": "backoff", "n": self.n, "base": self.base}
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        levels = range(meta["n"] + 2)
+        trie = cls(meta["n"], meta["base"], [arrays[f"tokens_{k}"] for k in levels],
+                   [arrays[f"counts_{k}"] for k in levels], [arrays[f"offsets_{k}"] for k in levels])
+        trie.cum = [arrays[f"cum_{k}"] for k in levels]
+        return trie
+
+
+class BackoffSampler(NgramSampler):
+    """
+    Trekt tokens uit een NgramTrie met stupid backoff (Brants et al., 2007): de score van een token w na
+    context c is de relatieve frequentie c(c w) / c(c) als c w in de tekst voorkomt, en anders alpha keer
+    de score na de context zonder het eerste token. Onderaan staat de lege context, dan is de score hoe
+    vaak het token voorkomt gedeeld door het aantal tokens. Het volgende token wordt getrokken naar de
+    genormaliseerde scores, dus ook tokens die niet na de langste context voorkomen maken een kans.
+
+    Omdat de opvolgers van een context ook opvolgers zijn van de kortere context, is die verdeling een
+    mengsel over de contextlengtes: eerst wordt een lengte k gekozen met gewicht alpha^(aantal stappen
+    terug) keer het deel van de tellingen na de context van lengte k dat niet al na de context van lengte
+    k + 1 voorkomt, daarna een opvolger van de context van lengte k naar de tellingen, waarbij opvolgers
+    van de langere context opnieuw getrokken worden.
+
+    Voor elke lengte k wordt de positie van de laatste k tokens in de trie bijgehouden. Na een nieuw token
+    is de context van lengte k + 1 een kind van de oude context van lengte k, dus elke stap kost n
+    zoekacties binnen de kinderen van één ngram in plaats van opnieuw te beginnen.
+
+    :param trie: NgramTrie met de tellingen
+    :param seed: seed voor de random generator, zodat uitkomsten reproduceerbaar zijn (optioneel)
+    :param alpha: factor per stap terug naar een kortere context, tussen 0 en 1 (default: 0.4)
+    """
+
+    def __init__(self, trie, seed=None, alpha=0.4):
+        self.store = trie
+        self.rng = np.random.default_rng(seed)
+        self.alpha = alpha
+        self.cum = trie.cumulative()
+        self.buffer = []
+        # (k, index in laag k) -> tellingen na de context van lengte k - 1 van tokens die ook na de
+        # context van lengte k voorkomen, zie overlap
+        self.overlaps = {}
+
+    def draw_child(self, level, i):
+        """
+        Kies een kind van ngram i uit laag level naar de tellingen: de index in laag level + 1.
+        """
+        lo, hi = self.store.children(level, i)
+        return self.draw(self.cum[level + 1], lo, hi)
+
+    def successor_total(self, level, i):
+        """
+        Som van de tellingen van alle opvolgers van ngram i uit laag level.
+        """
+        lo, hi = self.store.children(level, i)
+        if lo == hi:
+            return 0
+        cum = self.cum[level + 1]
+        return int(cum[hi - 1]) - (int(cum[lo - 1]) if lo > 0 else 0)
+
+    def overlap(self, level, i, shorter):
+        """
+        Som van de tellingen na de kortere context (ngram shorter uit laag level - 1) van de tokens die
+        ook na ngram i uit laag level voorkomen. Eén np.searchsorted over de opvolgers.
+        """
+        key = (level, i)
+        if key not in self.overlaps:
+            trie = self.store
+            lo, hi = trie.children(level, i)
+            short_lo, short_hi = trie.children(level - 1, shorter)
+            pos = short_lo + np.searchsorted(trie.tokens[level][short_lo:short_hi], trie.tokens[level + 1][lo:hi])
+            self.overlaps[key] = int(trie.counts[level][pos].sum())
+        return self.overlaps[key]
+
+    def generate(self, text_len):
+        """
+        Genereer willekeurige tekst: begin met een context van n tokens gekozen naar hoe vaak die met een
+        opvolger voorkomt en kies telkens een volgend token met stupid backoff.
+
+        :param text_len: Gewenste lengte van de te genereren tekst
+        :return: lijst met token-ID's
+        """
+        trie = self.store
+        n = trie.n
+
+        # unigrams: een starttoken en text_len tokens, net als NgramSampler
+        if n == 1:
+            level_1 = self.cum[1]
+            if not len(level_1):
+                return []
+            u = self.rng.random(text_len + 1) * level_1[-1]
+            return trie.tokens[1][np.searchsorted(level_1, u.astype(np.int64), side="right")].tolist()
+
+        # start met een context van de langste lengte <= n die opvolgers heeft, gekozen naar hoe vaak die
+        # met een opvolger voorkomt: trek een ngram van één token langer en laat het laatste token weg
+        start = max((k for k in range(1, n + 1) if len(trie.tokens[k + 1])), default=0)
+        if start == 0:
+            return []
+        j = self.draw(self.cum[start + 1], 0, len(trie.tokens[start + 1]))
+        sequence = list(trie.ngram(start + 1, j)[:-1])
+
+        # nodes[k]: index van de laatste k tokens in laag k, of -1 als die niet voorkomen
+        nodes = [0] * (n + 1)
+        for k in range(1, n + 1):
+            found = trie.find(tuple(sequence[-k:])) if k <= len(sequence) else None
+            nodes[k] = found[1] if found else -1
+
+        for _ in range(text_len - len(sequence)):
+            # langste context met opvolgers, de lege context (wortel) heeft altijd opvolgers
+            top = n
+            while top > 0 and (nodes[top] < 0 or not self.successor_total(top, nodes[top])):
+                top -= 1
+
+            # gewicht per lengte k: alpha^(top - k) keer het deel van de opvolgers van de context van
+            # lengte k dat niet na de context van lengte k + 1 voorkomt
+            weights = [1.0]
+            for k in range(top - 1, -1, -1):
+                total = self.successor_total(k, nodes[k])
+                free = total - self.overlap(k + 1, nodes[k + 1], nodes[k])
+                weights.append(self.alpha ** (top - k) * free / total)
+            u = self.uniform() * sum(weights)
+            k = top
+            for w in weights:
+                u -= w
+                if u < 0 or k == 0:
+                    break
+                k -= 1
+
+            # opvolger van de context van lengte k die niet na de context van lengte k + 1 voorkomt
+            while True:
+                j = self.draw_child(k, nodes[k])
+                next_word = int(trie.tokens[k + 1][j])
+                if k == top or trie.child(k + 1, nodes[k + 1], next_word) < 0:
+                    break
+            sequence.append(next_word)
+
+            # de context van lengte k + 1 is het kind van de oude context van lengte k
+            for k in range(n, 0, -1):
+                nodes[k] = trie.child(k - 1, nodes[k - 1], next_word) if nodes[k - 1] >= 0 else -1
+
+        return sequence
+
+
+def generate_sequence(store, text_len, seed=None):
+    """
+    Genereer willekeurige tekst met een NgramStore of NgramTrie, zie NgramSampler.generate en
+    BackoffSampler.generate.
+
+    :param store: NgramStore of NgramTrie met de tellingen
+    :param text_len: Gewenste lengte van de te genereren tekst
+    :param seed: seed voor reproduceerbare uitkomsten (optioneel)
+    :return: lijst met token-ID's
+    """
+    return store.sampler(seed).generate(text_len)
+
+
+# Store per workerproces voor generate_samples, wordt één keer gezet door init_worker
+worker_store = None
+
+
+def init_worker(store=None, model_file=None):
+    """
+    Zet de NgramStore van een workerproces: uit een modelbestand (memory mapped) of de meegegeven store.
+    """
+    global worker_store
+    worker_store = load_model(model_file)[0] if model_file else store
+
+
+def sample_worker(job):
+    """
+    Genereer één sequentie in een workerproces.
+
+    :param job: tuple van (tekstlengte, SeedSequence van deze sample)
+    :return: lijst met token-ID's
+    """
+    text_len, seed = job
+    return worker_store.sampler(seed).generate(text_len)
+
+
+def generate_samples(store, text_len, num_samples, seed=None, workers=1, model_file=None):
+    """
+    Genereer num_samples sequenties met één getraind model. Elke sample krijgt een eigen random stream
+    (SeedSequence.spawn), zodat de uitkomsten met dezelfde seed gelijk zijn, ongeacht het aantal workers.
+
+    :param store: NgramStore met de tellingen
+    :param text_len: Gewenste lengte van elke sequentie
+    :param num_samples: aantal sequenties
+    :param seed: seed voor reproduceerbare uitkomsten (optioneel)
+    :param workers: aantal processen, bij 1 wordt alles in dit proces gegenereerd
+    :param model_file: modelbestand van de store, workers openen dat zelf in plaats van de store te kopiëren (optioneel)
+    :return: generator met per sample een lijst met token-ID's, op volgorde
+    """
+    jobs = [(text_len, s) for s in np.random.SeedSequence(seed).spawn(num_samples)]
+
+    if workers <= 1:
+        for job_len, s in jobs:
+            yield store.sampler(s).generate(job_len)
+        return
+
+    initargs = (None, model_file) if model_file else (store, None)
+    chunksize = max(1, num_samples // (workers * 4))
+    with Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        yield from pool.imap(sample_worker, jobs, chunksize)
+
+
+def evaluate(store, tok_files, chunk_size=1 << 20, discount=0.75):
+    """
+    Bereken de log-likelihood en perplexity van held-out .tok bestanden onder een NgramTrie. Elk bestand
+    wordt in stukken gelezen (iter_token_chunks) en per stuk gevectoriseerd gescoord; de laatste n tokens
+    van een stuk gaan mee als context voor het volgende stuk, zodat het resultaat niet van de stukgrootte
+    afhangt.
+
+    :param store: NgramTrie met de tellingen
+    :param tok_files: lijst met paden naar .tok bestanden (tekst of binair)
+    :param chunk_size: aantal token-ID's per stuk
+    :param discount: D voor absolute discounting, zie NgramTrie.log_probs
+    :return: lijst met per bestand (bestand, aantal tokens, log-likelihood)
+    """
+    results = []
+    for tok_file in tok_files:
+        history = np.zeros(0, dtype=np.int64)
+        num_tokens = 0
+        log_likelihood = 0.0
+        for chunk in iter_token_chunks(tok_file, chunk_size):
+            tokens = np.concatenate([history, chunk])
+            log_probs = store.log_probs(tokens, len(history), discount)
+            num_tokens += len(log_probs)
+            log_likelihood += float(log_probs.sum())
+            history = tokens[len(tokens) - store.n:]
+        results.append((tok_file, num_tokens, log_likelihood))
+    return results
+
+
+def perplexity(num_tokens, log_likelihood):
+    """
+    Perplexity uit de log-likelihood (natuurlijke log): exp(-log-likelihood / aantal tokens).
+    """
+    return float(np.exp(-log_likelihood / num_tokens)) if num_tokens else float("nan")
+
+
+def save_model(store, model_file, enc_file=None):
+    """
+    Sla een getelde NgramStore of NgramTrie op in een binair modelbestand (zie nlp.save_arrays), samen
+    met de cumulatieve tellingen van de sampler en een verwijzing naar het .enc bestand.
+
+    :param store: NgramStore of NgramTrie met de tellingen
+    :param model_file: pad van het modelbestand
+    :param enc_file: encodingbestand van de tokenizer waar de token-ID's bij horen (optioneel)
+    """
+    arrays, meta = store.to_arrays()
+    meta["enc"] = os.path.abspath(enc_file) if enc_file else None
+    save_arrays(model_file, MODEL_MAGIC, arrays, meta)
+
+
+# Soorten modellen in een modelbestand (meta "kind")
+MODEL_KINDS = {"ngram": NgramStore, "backoff": NgramTrie}
+
+
+def load_model(model_file, mmap=True):
+    """
+    Laad een modelbestand van save_model. Met mmap worden de arrays met numpy.memmap geopend, zodat
+    laden vrijwel geen tijd kost en alleen de delen die gebruikt worden ingelezen worden.
+
+    :param model_file: pad naar het modelbestand
+    :param mmap: arrays memory mappen in plaats van inlezen
+    :return: de NgramStore of NgramTrie en het pad van het .enc bestand (of None)
+    """
+    meta, arrays = load_arrays(model_file, MODEL_MAGIC, mmap)
+    store = MODEL_KINDS[meta.get("kind", "ngram")].from_arrays(meta, arrays)
+    return store, meta["enc"]
+
+
 def write_output(sequence, output_file):
     """
     Schrijft de output weg naar een bestand
@@ -138,70 +1010,256 @@ def write_output(sequence, output_file):
     with open(output_file, "w", encoding="utf-8") as output:
         output.write("".join(str(tok) for tok in sequence))
 
-def parse_args():
+
+def write_decoded(sequence_int, enc_file, output_file):
+    """
+    Zet de gegenereerde token-ID's om naar tekst met de encoding en schrijf die weg.
+    """
+    id_to_tok = load_enc(enc_file)
+    sequence_words = [[t] for t in sequence_int]
+    decoded_text = decode(sequence_words, id_to_tok)
+    write_output(decoded_text, output_file)
+
+
+def write_samples(samples, enc_file, output_file, fmt="lines"):
+    """
+    Decodeer de samples en schrijf ze naar één bestand: één tekst per regel, of als JSON lines
+    met {"id": ..., "text": ...} per regel.
+
+    :param samples: iterable met per sample een lijst met token-ID's
+    :param enc_file: encodingbestand van de tokenizer
+    :param output_file: het pad waarnaar de output geschreven moet worden
+    :param fmt: 'lines' of 'jsonl'
+    :return: aantal geschreven samples
+    """
+    id_to_tok = load_enc(enc_file)
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as output:
+        for i, sequence_int in enumerate(samples):
+            text = decode([[t] for t in sequence_int], id_to_tok)
+            if fmt == "jsonl":
+                output.write(json.dumps({"id": i, "text": text}, ensure_ascii=False) + "\n")
+            else:
+                # tokens kunnen zelf geen regeleinde bevatten, maar voor de zekerheid: één sample per regel
+                output.write(text.replace("\n", " ") + "\n")
+            count += 1
+    return count
+
+
+MODES = ["run", "train", "generate", "evaluate"]
+
+# Extensies van het eerste inputbestand waaraan de oude aanroep zonder modus herkend wordt
+LEGACY_EXTENSIONS = (".tok", ".tokb")
+
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description="N-gram text generator",
         formatter_class=argparse.RawTextHelpFormatter
     )
+    subparsers = parser.add_subparsers(dest="mode")
+    subparsers.required = True
 
-    parser.add_argument(
+    run_parser = subparsers.add_parser("run", help="Train en genereer in één keer (default)")
+    train_parser = subparsers.add_parser("train", help="Tel de ngrammen en sla het model op")
+    generate_parser = subparsers.add_parser("generate", help="Genereer tekst met een opgeslagen model")
+    evaluate_parser = subparsers.add_parser("evaluate", help="Bereken log-likelihood en perplexity van .tok bestanden")
+
+    evaluate_parser.add_argument(
+        "model",
+        help="Modelbestand gemaakt met train --backoff"
+    )
+    evaluate_parser.add_argument(
         "tok_files",
         nargs="+",
-        help="Input .tok file(s), meerdere bestanden zijn toegestaan"
+        help="Held-out .tok file(s) (tekst of binair)"
     )
-    parser.add_argument(
-        "-n",
+    evaluate_parser.add_argument(
+        "--chunk_size",
         type=int,
-        required=True,
-        help="Lengte van de n-grams"
+        default=1 << 20,
+        help="Aantal tokens dat per keer gelezen en gescoord wordt (default: 1048576)"
     )
-    parser.add_argument(
-        "-l", "--length",
-        type=int,
-        required=True,
-        help="Gewenste lengte voor de te genereren tekst"
+    evaluate_parser.add_argument(
+        "--discount",
+        type=float,
+        default=0.75,
+        help="Discount D voor absolute discounting, tussen 0 en 1 (default: 0.75)"
     )
-    parser.add_argument(
-        "-o", "--output",
-        type=str,
-        required=True,
-        help="Outputbestand voor de gegenereerde tekst"
+
+    for sub in (run_parser, train_parser):
+        sub.add_argument(
+            "tok_files",
+            nargs="+",
+            help="Input .tok file(s) (tekst of binair), meerdere bestanden zijn toegestaan"
+        )
+        sub.add_argument(
+            "-n",
+            type=int,
+            required=True,
+            help="Lengte van de n-grams"
+        )
+        sub.add_argument(
+            "--counting",
+            choices=["numpy", "python"],
+            default="numpy",
+            help="Manier van ngrammen tellen: gevectoriseerd met numpy (default) of met de oude Python-loop als fallback"
+        )
+        sub.add_argument(
+            "--backoff",
+            action="store_true",
+            help="Sla alle ngrammen van lengte 1..n + 1 op en val bij een onbekende context terug op een kortere context"
+        )
+
+    generate_parser.add_argument(
+        "model",
+        help="Modelbestand gemaakt met train"
     )
-    parser.add_argument(
+
+    for sub in (run_parser, generate_parser):
+        sub.add_argument(
+            "-l", "--length",
+            type=int,
+            required=True,
+            help="Gewenste lengte voor de te genereren tekst"
+        )
+        sub.add_argument(
+            "-s", "--seed",
+            type=int,
+            default=None,
+            help="Seed voor de random generator, voor reproduceerbare tekst"
+        )
+        sub.add_argument(
+            "-k", "--num_samples",
+            type=int,
+            default=None,
+            help="Genereer K sequenties met hetzelfde model, weggeschreven in één bestand (één per regel)"
+        )
+        sub.add_argument(
+            "-w", "--workers",
+            type=int,
+            default=1,
+            help="Aantal processen voor --num_samples (default: 1)"
+        )
+        sub.add_argument(
+            "--format",
+            choices=["lines", "jsonl"],
+            default="lines",
+            help="Outputformaat voor --num_samples: één tekst per regel (default) of JSON lines"
+        )
+
+    for sub in (run_parser, train_parser, generate_parser):
+        sub.add_argument(
+            "-o", "--output",
+            type=str,
+            required=True,
+            help="Outputbestand voor de gegenereerde tekst (bij train: het modelbestand)"
+        )
+
+    run_parser.add_argument(
         "-e", "--enc",
         type=str,
         required=True,
         help="Encodingbestand (.enc) van de tokenizer"
     )
+    train_parser.add_argument(
+        "-e", "--enc",
+        type=str,
+        default=None,
+        help="Encodingbestand (.enc) van de tokenizer, wordt in het model bewaard voor generate"
+    )
+    generate_parser.add_argument(
+        "-e", "--enc",
+        type=str,
+        default=None,
+        help="Encodingbestand (.enc) van de tokenizer, default het bestand dat in het model staat"
+    )
 
-    return parser.parse_args()
+    # De oude aanroep zonder modus (trainen en genereren in één keer) wordt herkend aan het eerste
+    # inputbestand: dat eindigt op .tok of .tokb. Die aanroep wordt direct met de parser van run gelezen,
+    # zodat foutmeldingen de oude aanroep tonen en niet een verborgen subcommando.
+    argv = sys.argv[1:] if argv is None else list(argv)
+    first = first_positional(argv, run_parser)
+    if first is not None and first not in MODES and first.endswith(LEGACY_EXTENSIONS):
+        run_parser.prog = parser.prog
+        args = run_parser.parse_args(argv)
+        args.mode = "run"
+        return args
+
+    return parser.parse_args(argv)
+
+
+def first_positional(argv, parser):
+    """
+    Het eerste argument dat geen optie en geen waarde van een optie van parser is, of None.
+    """
+    value_options = {opt for action in parser._actions if action.nargs != 0 for opt in action.option_strings}
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg.startswith("-"):
+            skip = arg in value_options
+        else:
+            return arg
+    return None
 
 def main():
     args = parse_args()
 
-    tokens = args.tok_files
-    n = args.n
-    text_len = args.length
-    output_file = args.output
-    enc_file = args.enc
+    if args.mode == "train":
+        tokenized_texts = load_token_stream(args.tok_files)
+        model = NgramTrie if args.backoff else NgramStore
+        store = model.from_tokens(tokenized_texts, args.n, args.counting)
+        save_model(store, args.output, args.enc)
+        size = f"{len(store)} ngrammen" if args.backoff else f"{len(store)} contexten"
+        print(f"N-gram model met n:{args.n} en {size} opgeslagen op {args.output}")
+        return
 
-    tokenized_texts = []
+    if args.mode == "evaluate":
+        store, _ = load_model(args.model)
+        if not isinstance(store, NgramTrie):
+            print("Error: evaluate vereist een model getraind met --backoff (alle ngramlengtes)")
+            return
+        results = evaluate(store, args.tok_files, args.chunk_size, args.discount)
+        for tok_file, num_tokens, log_likelihood in results:
+            print(f"{tok_file}: {num_tokens} tokens, log-likelihood {log_likelihood:.2f}, "
+                  f"perplexity {perplexity(num_tokens, log_likelihood):.3f}")
+        num_tokens = sum(r[1] for r in results)
+        log_likelihood = sum(r[2] for r in results)
+        print(f"Totaal (n:{store.n}): {num_tokens} tokens, log-likelihood {log_likelihood:.2f}, "
+              f"perplexity {perplexity(num_tokens, log_likelihood):.3f}")
+        return
 
-    for token_file in tokens:
-        tokenized_text = filereader(token_file)
-        tokenized_texts.extend(tokenized_text)
+    if args.mode == "generate":
+        store, model_enc = load_model(args.model)
+        enc_file = args.enc or model_enc
+        if not enc_file:
+            print("Error: generate vereist --enc <bestand> als het model geen encoding bevat")
+            return
+        n = store.n
+    else:
+        # Alle token-ID's achter elkaar in één numpy array en de tellingen in een NgramStore (of NgramTrie)
+        n = args.n
+        tokenized_texts = load_token_stream(args.tok_files)
+        model = NgramTrie if args.backoff else NgramStore
+        store = model.from_tokens(tokenized_texts, n, args.counting)
+        enc_file = args.enc
 
-    probability_dict, ngram_counts = determine_probability(tokenized_texts, n)
-    sequence = generate_text(n, tokenized_texts, text_len, probability_dict, ngram_counts)
+    text_len = args.length
+    output_file = args.output
 
-    sequence_int = [int(tok) for tok in sequence]
+    if args.num_samples is not None:
+        model_file = args.model if args.mode == "generate" else None
+        samples = generate_samples(store, text_len, args.num_samples, args.seed, args.workers, model_file)
+        count = write_samples(samples, enc_file, output_file, args.format)
+        print(f"{count} n-gram teksten met n:{n} en lengte {text_len} succesvol gegenereerd, opgeslagen op {output_file}")
+        return
 
-    id_to_tok = load_enc(enc_file)
-    sequence_words = [[t] for t in sequence_int]
-    decoded_text = decode(sequence_words, id_to_tok)
+    sequence_int = generate_sequence(store, text_len, args.seed)
 
-    write_output(decoded_text, output_file)
+    write_decoded(sequence_int, enc_file, output_file)
     print(f"N-gram tekst met n:{n} en lengte {text_len} succesvol gegenereerd, opgeslagen op {output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
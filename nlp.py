@@ -1,5 +1,17 @@
-from collections import Counter
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Sequence
+import heapq
+import json
+import os
+from multiprocessing import Pipe, Process
+import pickle
+import struct
+import tempfile
+from array import array
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.io import mmread, mmwrite
 import math
 
 def filereader(file_path):
@@ -18,6 +30,83 @@ def filereader(file_path):
     return text.strip().split()
 
 
+def iter_words(file_path, chunk_size=1 << 20):
+    """
+    Lees een tekstbestand in stukken in en geef de woorden één voor één terug, in kleine letters.
+    Geeft dezelfde woorden als filereader, maar houdt nooit meer dan één stuk van het bestand in het geheugen.
+
+    Parameters:
+        file_path: pad naar het tekstbestand dat ingelezen moet worden.
+        chunk_size: aantal karakters dat per keer gelezen wordt, default 1M
+
+    Returns:
+        generator met de woorden uit het bestand
+    """
+    rest = ""
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            words = chunk.split()
+            # Als het stuk niet op witruimte eindigt kan het laatste woord doorlopen in het volgende stuk
+            if words and not chunk[-1].isspace():
+                rest = words.pop()
+            else:
+                rest = ""
+            for w in words:
+                yield w.lower()
+    if rest:
+        yield rest.lower()
+
+
+# ASCII-witruimte: hierop kan een UTF-8 bestand veilig gesplitst worden, deze bytes komen niet voor
+# binnen een karakter van meerdere bytes en str.split() splitst er altijd op
+WHITESPACE_BYTES = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+def byte_shards(file_path, num_shards):
+    """
+    Verdeel een bestand in ongeveer even grote stukken (byte ranges) die op witruimte beginnen,
+    zodat geen woord over twee stukken verdeeld wordt.
+
+    Parameters:
+        file_path: pad naar het tekstbestand
+        num_shards: gewenst aantal stukken
+
+    Returns:
+        shards: lijst van (start, eind) byte-posities, aaneengesloten en op volgorde
+    """
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for k in range(1, num_shards):
+            pos = max(size * k // num_shards, bounds[-1])
+            f.seek(pos)
+            # Schuif op tot de eerstvolgende witruimte
+            while pos < size:
+                block = f.read(1 << 16)
+                hits = [i for i in (block.find(bytes([b])) for b in WHITESPACE_BYTES) if i >= 0]
+                if hits:
+                    pos += min(hits)
+                    break
+                pos += len(block)
+            bounds.append(min(pos, size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def read_words_range(file_path, start, end):
+    """
+    Lees de woorden uit een byte range van een bestand (zie byte_shards), in kleine letters.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    return [w.lower() for w in text.split()]
+
+
 def get_pairs(words_tokens):
     """
     Genereer een lijst van alle token-paren in de woordenlijst.
@@ -125,6 +214,346 @@ def encoder(words, max_tokens=1000, min_freq=2):
     return words_tokens, id_to_tok
 
 
+def merge_pair(w, pair, new_id):
+    """
+    Vervang in één woord alle (niet-overlappende) voorkomens van een token-paar door het nieuwe token,
+    van links naar rechts, precies zoals encoder dat doet.
+
+    Parameters:
+        w : lijst van token-ID's van één woord
+        pair : tuple met het paar token-ID's dat samengevoegd wordt
+        new_id : token-ID van het nieuwe token
+
+    Returns:
+        new_w : nieuwe lijst van token-ID's
+    """
+    new_w = []
+    i = 0
+    while i < len(w):
+        if i < len(w) - 1 and w[i] == pair[0] and w[i + 1] == pair[1]:
+            new_w.append(new_id)
+            i += 2
+        else:
+            new_w.append(w[i])
+            i += 1
+    return new_w
+
+
+class WordTokens(Sequence):
+    """
+    Lijst van token-ID's per woord in de tekst, die pas bij opvragen wordt opgebouwd uit de tokens per
+    uniek woord. Gedraagt zich als de words_tokens lijst van encoder (indexeren, slicen, itereren),
+    maar bewaart geen aparte tokenlijst per voorkomen van een woord.
+    Woorden die meerdere keren voorkomen delen dezelfde lijst, deze lijsten dus niet aanpassen.
+    """
+
+    def __init__(self, words, word_to_tokens):
+        self.words = words
+        self.word_to_tokens = word_to_tokens
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.word_to_tokens[w] for w in self.words[index]]
+        return self.word_to_tokens[self.words[index]]
+
+
+class PairIndex:
+    """
+    Paartellingen en een index van paar -> woorden voor een lijst van woorden (of een deel van het
+    corpus), zodat bij een merge alleen de woorden met dat paar herschreven hoeven te worden.
+
+    Parameters:
+        words_tokens : lijst van woorden, elk woord is een lijst van token-ID's
+        weights : hoe vaak elk woord meetelt (de woordfrequentie bij word_types)
+        offset : index van het eerste woord in het hele corpus, voor first_occurrences
+    """
+
+    def __init__(self, words_tokens, weights, offset=0):
+        self.words_tokens = words_tokens
+        self.weights = weights
+        self.offset = offset
+        self.pair_counts = Counter()
+        self.pair_words = defaultdict(set)
+        for idx, w in enumerate(words_tokens):
+            for pair in zip(w, w[1:]):
+                self.pair_counts[pair] += weights[idx]
+                self.pair_words[pair].add(idx)
+
+    def counts(self):
+        return self.pair_counts
+
+    def first_occurrences(self, pairs):
+        """
+        Geef voor elk paar de positie (woord, index in woord) waar het voor het eerst voorkomt. Dit bepaalt
+        de volgorde bij gelijke tellingen, zoals de invoegvolgorde van Counter in encoder.
+        """
+        first = {}
+        for pair in pairs:
+            if pair not in self.pair_words:
+                continue
+            idx = min(self.pair_words[pair])
+            w = self.words_tokens[idx]
+            for i in range(len(w) - 1):
+                if w[i] == pair[0] and w[i + 1] == pair[1]:
+                    first[pair] = (self.offset + idx, i)
+                    break
+        return first
+
+    def merge(self, pair, new_id):
+        """
+        Voeg een paar samen tot new_id in alle woorden waarin het voorkomt en werk de tellingen bij.
+        """
+        for idx in self.pair_words.pop(pair, ()):
+            w = self.words_tokens[idx]
+            new_w = merge_pair(w, pair, new_id)
+
+            old_pairs = list(zip(w, w[1:]))
+            new_pairs = list(zip(new_w, new_w[1:]))
+            for p in old_pairs:
+                self.pair_counts[p] -= self.weights[idx]
+                if self.pair_counts[p] == 0:
+                    del self.pair_counts[p]
+            for p in new_pairs:
+                self.pair_counts[p] += self.weights[idx]
+
+            # Werk de paar -> woorden index bij
+            for p in set(old_pairs).difference(new_pairs):
+                if p in self.pair_words:
+                    self.pair_words[p].discard(idx)
+                    if not self.pair_words[p]:
+                        del self.pair_words[p]
+            for p in new_pairs:
+                self.pair_words[p].add(idx)
+
+            self.words_tokens[idx] = new_w
+
+    def merge_all(self, merges):
+        """
+        Voer een lijst van (paar, new_id) merges op volgorde uit.
+        """
+        for pair, new_id in merges:
+            self.merge(pair, new_id)
+
+    def tokens(self):
+        return self.words_tokens
+
+
+class LocalShard:
+    """
+    Deel van het corpus in dit proces. Heeft dezelfde send/recv aanroepen als ProcessShard, zodat
+    bpe_rounds niet hoeft te weten of een deel in een ander proces zit.
+    """
+
+    def __init__(self, words_tokens, weights, offset=0):
+        self.index = PairIndex(words_tokens, weights, offset)
+        self.result = None
+
+    def send(self, method, *args):
+        self.result = getattr(self.index, method)(*args)
+
+    def recv(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def shard_worker(conn, words_tokens, weights, offset):
+    """
+    Werkproces voor ProcessShard: houdt een PairIndex bij en voert de aanroepen uit die via de pipe binnenkomen.
+    """
+    index = PairIndex(words_tokens, weights, offset)
+    while True:
+        method, args = conn.recv()
+        if method is None:
+            break
+        conn.send(getattr(index, method)(*args))
+    conn.close()
+
+
+class ProcessShard:
+    """
+    Deel van het corpus in een apart proces, zodat paren tellen en merges uitvoeren voor alle delen
+    tegelijk kan gebeuren.
+    """
+
+    def __init__(self, words_tokens, weights, offset=0):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=shard_worker, args=(child_conn, words_tokens, weights, offset), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def send(self, method, *args):
+        self.conn.send((method, args))
+
+    def recv(self):
+        return self.conn.recv()
+
+    def close(self):
+        self.conn.send((None, ()))
+        self.process.join()
+
+
+def bpe_rounds(shards, id_to_tok, max_tokens, min_freq):
+    """
+    Voer de merges van de BPE uit in rondes, net als encoder. Aan het begin van een ronde worden de
+    paartellingen van alle delen van het corpus opgeteld en alle kandidaat-paren in een priority queue
+    gezet (hoogste telling eerst, bij gelijke telling het paar dat het eerst in de tekst voorkomt).
+    Daarna worden de merges van de ronde op volgorde in elk deel uitgevoerd. Omdat de keuzes in een
+    ronde alleen van de tellingen aan het begin van de ronde afhangen, is de uitkomst gelijk aan die
+    van encoder, ongeacht in hoeveel delen het corpus verdeeld is.
+
+    Parameters:
+        shards : lijst van LocalShard of ProcessShard, op volgorde van het corpus
+        id_to_tok : dict van token-ID:token met de single-character tokens, wordt aangevuld
+        max_tokens : maximale aantal tokens
+        min_freq : minimale (gewogen) telling van een paar om samengevoegd te worden
+
+    Returns:
+        merges : dict van token-paar:token-ID van het samengevoegde token
+    """
+    merges = {}
+    while len(id_to_tok) < max_tokens:
+        for shard in shards:
+            shard.send("counts")
+        if len(shards) == 1:
+            pair_counts = shards[0].recv()
+        else:
+            pair_counts = Counter()
+            for shard in shards:
+                pair_counts.update(shard.recv())
+
+        # Kandidaten van deze ronde, alleen paren van letters die vaak genoeg voorkomen
+        candidates = [pair for pair, freq in pair_counts.items()
+                      if freq >= min_freq and id_to_tok[pair[0]].isalpha() and id_to_tok[pair[1]].isalpha()]
+
+        # Geen paren meer om samen te voegen
+        if not candidates:
+            break
+
+        for shard in shards:
+            shard.send("first_occurrences", candidates)
+        first = {}
+        for shard in shards:
+            for pair, pos in shard.recv().items():
+                if pair not in first or pos < first[pair]:
+                    first[pair] = pos
+
+        queue = [(-pair_counts[pair], first[pair], pair) for pair in candidates]
+        heapq.heapify(queue)
+
+        round_merges = []
+        while queue and len(id_to_tok) < max_tokens:
+            _, _, top_pair = heapq.heappop(queue)
+
+            # Voeg nieuwe token toe, ook als het paar door een eerdere merge in deze ronde niet meer voorkomt
+            new_id = len(id_to_tok) + 1
+            id_to_tok[new_id] = id_to_tok[top_pair[0]] + id_to_tok[top_pair[1]]
+            merges[top_pair] = new_id
+            round_merges.append((top_pair, new_id))
+
+        # Herschrijf in elk deel alleen de woorden waarin de paren voorkomen
+        for shard in shards:
+            shard.send("merge_all", round_merges)
+        for shard in shards:
+            shard.recv()
+
+    return merges
+
+
+def incremental_encoder(words, max_tokens=1000, min_freq=2, word_types=True, return_merges=False, workers=1):
+    """
+    Maak een BPE op dezelfde manier als encoder, maar houd de paartellingen bij in plaats van ze
+    na elke merge opnieuw over het hele corpus te tellen.
+
+    Er wordt een tabel met paartellingen en een index van paar -> woorden bijgehouden (PairIndex). Bij
+    een merge worden alleen de woorden herschreven waarin het paar voorkomt, en alleen hun paren worden
+    bijgewerkt. De merges worden in rondes gedaan zoals in encoder (zie bpe_rounds), zodat id_to_tok
+    exact gelijk is aan die van encoder.
+
+    Met word_types worden de woorden eerst samengevoegd tot een Counter van unieke woorden en tellen
+    de paren mee met de frequentie van het woord. Een woord als "the" wordt dan één keer herschreven
+    in plaats van bij elk voorkomen. De volgorde van de unieke woorden is die van hun eerste voorkomen,
+    dus de uitkomst is gelijk aan die zonder word_types.
+
+    Met workers > 1 worden de woorden in aaneengesloten delen over processen verdeeld. Elk proces
+    telt de paren en voert de merges uit voor zijn eigen deel, de tellingen worden per ronde opgeteld.
+    De vocabulaire is gelijk aan die met één proces.
+
+    Parameters:
+        words : lijst met woorden uit de input tekst, of een Counter van woord:frequentie (bijv. uit
+            word_type_counter). Met een Counter is words_tokens één lijst per uniek woord.
+        max_tokens : maximale aantal unieke tokens voor de encoding, default 1000
+        min_freq : hoe vaak een paar tokens ten minste moet voorkomen om te worden samengevoegd, default 2
+        word_types : train op unieke woorden met frequenties in plaats van op elk woord, default True
+        return_merges : geef ook de geleerde merges terug, default False
+        workers : aantal processen, default 1
+
+    Returns:
+        words_tokens : lijst van woorden, elk woord is een lijst van token-ID's. Met word_types is dit
+            een WordTokens object dat de lijst per woord pas opbouwt als die opgevraagd wordt.
+        id_to_tok : dict met token-ID's als keys en token-strings als values
+        merges : (alleen met return_merges) dict van token-paar:token-ID van het samengevoegde token. Het
+            token-ID is ook de rang van de merge, lagere ID's zijn eerder samengevoegd.
+    """
+    if word_types:
+        word_counts = words if isinstance(words, Counter) else Counter(words)
+        types = list(word_counts.keys())
+        weights = list(word_counts.values())
+    else:
+        types = words
+        weights = [1] * len(words)
+
+    unique_chars = set(c for w in types for c in w)
+    if max_tokens < len(unique_chars):
+        print(
+            f"Warning: max_tokens ({max_tokens}) is smaller than number of unique letters ({len(unique_chars)}). "
+            f"Setting max_tokens to {len(unique_chars)}."
+        )
+        max_tokens = len(unique_chars)
+
+    tok_dict = {}
+    types_tokens = []
+
+    # Initialiseer single-character tokens
+    for w in types:
+        w_tok = []
+        for c in w:
+            if c not in tok_dict:
+                tok_dict[c] = len(tok_dict) + 1
+            w_tok.append(tok_dict[c])
+        types_tokens.append(w_tok)
+
+    id_to_tok = {v: k for k, v in tok_dict.items()}
+
+    # Verdeel de woorden in aaneengesloten delen, één per proces
+    if workers > 1 and len(types_tokens) > 1:
+        size = -(-len(types_tokens) // workers)
+        shards = [ProcessShard(types_tokens[start:start + size], weights[start:start + size], start)
+                  for start in range(0, len(types_tokens), size)]
+    else:
+        shards = [LocalShard(types_tokens, weights)]
+
+    try:
+        merges = bpe_rounds(shards, id_to_tok, max_tokens, min_freq)
+        types_tokens = []
+        for shard in shards:
+            shard.send("tokens")
+            types_tokens.extend(shard.recv())
+    finally:
+        for shard in shards:
+            shard.close()
+
+    if word_types:
+        types_tokens = WordTokens(types if isinstance(words, Counter) else words, dict(zip(types, types_tokens)))
+    if return_merges:
+        return types_tokens, id_to_tok, merges
+    return types_tokens, id_to_tok
+
+
 def load_enc(enc_file):
     """
     Laad een .enc bestand en maak een mapping van token-ID naar token-inhoud.
@@ -135,6 +564,9 @@ def load_enc(enc_file):
     Returns:
         id_to_tok: dict van token-ID:token-inhoud
     """
+    if is_enc_bin(enc_file):
+        return load_vocab(enc_file)["id_to_tok"]
+
     id_to_tok = {}
     with open(enc_file, "r", encoding="utf-8") as f:
         for line in f:
@@ -145,6 +577,294 @@ def load_enc(enc_file):
     return id_to_tok
 
 
+def merges_path(enc_file):
+    """
+    Geef het pad van het .merges bestand dat bij een .enc bestand hoort.
+    """
+    return os.path.splitext(enc_file)[0] + ".merges"
+
+
+def load_merges(enc_file):
+    """
+    Laad de merge-rangen die bij een .enc bestand horen. Elke regel van het .merges bestand is
+    'token-ID:linker-ID rechter-ID', het token-ID van het samengevoegde token is ook de rang van de merge.
+
+    Parameters:
+        enc_file : pad naar het .enc bestand (of binaire .encb, daar staan de merges zelf in)
+
+    Returns:
+        merges : dict van token-paar:token-ID, of None als er geen .merges bestand is (oude .enc bestanden)
+    """
+    if is_enc_bin(enc_file):
+        return load_vocab(enc_file)["merges"]
+
+    path = merges_path(enc_file)
+    if not os.path.exists(path):
+        return None
+
+    merges = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            k, v = line.strip().split(":", 1)
+            left, right = v.split()
+            merges[(int(left), int(right))] = int(k)
+    return merges
+
+
+# Binaire vocabulaire (.encb): 8 bytes magic gevolgd door een pickle met de mapping ID -> token, de
+# omgekeerde mapping, de merges en de trie, zodat alles in één keer ingelezen wordt zonder te parsen
+# of op te bouwen. Net als elke pickle alleen bestanden openen die je vertrouwt.
+ENC_MAGIC = b"NLPENCB1"
+
+
+def is_enc_bin(enc_file):
+    """
+    Geef True als het encodingbestand in het binaire formaat is.
+    """
+    return has_magic(enc_file, ENC_MAGIC)
+
+
+def save_vocab(path, id_to_tok, merges=None):
+    """
+    Sla een vocabulaire op in het binaire .encb formaat, met de omgekeerde mapping en de trie erbij.
+
+    Parameters:
+        path : pad van het outputbestand
+        id_to_tok : dict van token-ID:token-inhoud
+        merges : dict van token-paar:token-ID van het samengevoegde token (optioneel)
+    """
+    tok_to_id = {v: k for k, v in id_to_tok.items()}
+    vocab = {"id_to_tok": id_to_tok, "tok_to_id": tok_to_id, "trie": build_trie(tok_to_id), "merges": merges}
+    with open(path, "wb") as f:
+        f.write(ENC_MAGIC)
+        pickle.dump(vocab, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_vocab(enc_file):
+    """
+    Laad een vocabulaire met alles wat de Tokenizer nodig heeft. Een binair .encb bestand wordt in één
+    keer ingelezen, bij een .enc tekstbestand worden de mappings en de trie hier opgebouwd.
+
+    Parameters:
+        enc_file : pad naar het .enc of .encb bestand
+
+    Returns:
+        vocab : dict met id_to_tok, tok_to_id, trie en merges (None als die er niet zijn)
+    """
+    if is_enc_bin(enc_file):
+        with open(enc_file, "rb") as f:
+            data = f.read()
+        return pickle.loads(memoryview(data)[len(ENC_MAGIC):])
+
+    id_to_tok = load_enc(enc_file)
+    tok_to_id = {v: k for k, v in id_to_tok.items()}
+    return {"id_to_tok": id_to_tok, "tok_to_id": tok_to_id, "trie": build_trie(tok_to_id),
+            "merges": load_merges(enc_file)}
+
+
+def build_trie(tok_to_id):
+    """
+    Bouw een karakter-trie van alle tokens, zodat de langste match in één keer door een woord te lopen
+    gevonden kan worden.
+
+    Parameters:
+        tok_to_id : dict van token-inhoud:token-ID
+
+    Returns:
+        trie : geneste dicts van karakter -> knoop, het token-ID van een knoop staat onder de key None
+    """
+    trie = {}
+    for tok, tok_id in tok_to_id.items():
+        node = trie
+        for c in tok:
+            node = node.setdefault(c, {})
+        node[None] = tok_id
+    return trie
+
+
+class Tokenizer:
+    """
+    Tokenizer die tekst omzet naar token-ID's met een vaste vocabulaire (bijv. uit een .enc bestand).
+
+    Er zijn twee manieren van tokenizen:
+        - greedy: per positie in een woord wordt het langste token gekozen dat daar begint
+          (greedy longest match), door de trie te volgen zolang de karakters overeenkomen.
+        - merges: de geleerde merges worden opnieuw toegepast, het paar met de laagste rang eerst,
+          zodat een woord net zo wordt opgesplitst als tijdens het leren van de BPE.
+
+    Omdat dezelfde woorden in tekst heel vaak terugkomen, worden de tokens van de laatst gebruikte
+    woorden bewaard in een cache (maximaal cache_size woorden, het langst niet gebruikte woord
+    wordt eruit gehaald). cache_hits en cache_misses houden bij hoe vaak de cache geholpen heeft.
+    """
+
+    def __init__(self, id_to_tok, merges=None, strategy="greedy", cache_size=10000, tok_to_id=None, trie=None):
+        if strategy == "merges" and merges is None:
+            raise ValueError("strategy 'merges' vereist merge-rangen (.merges bestand)")
+        self.id_to_tok = id_to_tok
+        # tok_to_id en de trie kunnen al opgebouwd meegegeven worden (uit een .encb bestand)
+        self.tok_to_id = {v: k for k, v in id_to_tok.items()} if tok_to_id is None else tok_to_id
+        self.trie = build_trie(self.tok_to_id) if trie is None else trie
+        self.merges = merges
+        self.strategy = strategy
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_enc(cls, enc_file, strategy="auto", cache_size=10000):
+        """
+        Maak een Tokenizer van een .enc of .encb bestand. Met strategy 'auto' worden de merges gebruikt
+        als die er zijn (.merges bestand naast het .enc bestand) en anders greedy longest match.
+        """
+        vocab = load_vocab(enc_file)
+        if strategy == "auto":
+            strategy = "greedy" if vocab["merges"] is None else "merges"
+        return cls(vocab["id_to_tok"], vocab["merges"], strategy, cache_size, vocab["tok_to_id"], vocab["trie"])
+
+    def tokenize_word(self, w):
+        """
+        Zet één woord om naar een lijst van token-ID's, via de cache als het woord daar al in staat.
+        Woorden die vaker voorkomen krijgen dezelfde lijst terug, deze lijsten dus niet aanpassen.
+
+        Parameters:
+            w : woord (string)
+
+        Returns:
+            w_tok : lijst van token-ID's
+        """
+        if self.cache_size <= 0:
+            return self.segment_word(w)
+
+        w_tok = self.cache.get(w)
+        if w_tok is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(w)
+            return w_tok
+
+        self.cache_misses += 1
+        w_tok = self.segment_word(w)
+        self.cache[w] = w_tok
+        if len(self.cache) > self.cache_size:
+            # Verwijder het woord dat het langst niet gebruikt is
+            self.cache.popitem(last=False)
+        return w_tok
+
+    def tokenize_known(self, w):
+        """
+        Zet één woord om zoals tokenize_word, maar karakters die niet in de vocabulaire staan worden
+        overgeslagen in plaats van een KeyError te geven: het woord wordt op die karakters gesplitst en de
+        delen worden los getokenized. Voor tekst die niet bij het leren van de vocabulaire gebruikt is.
+        """
+        try:
+            return self.tokenize_word(w)
+        except KeyError:
+            w_tok = []
+            part = ""
+            for c in w + "\0":
+                if c in self.tok_to_id:
+                    part += c
+                    continue
+                if part:
+                    w_tok.extend(self.tokenize_word(part))
+                part = ""
+            return w_tok
+
+    def segment_word(self, w):
+        """
+        Zet één woord om naar token-ID's met de gekozen strategie, zonder cache.
+        """
+        if self.strategy == "merges":
+            return self.merge_word(w)
+        return self.greedy_word(w)
+
+    def greedy_word(self, w):
+        """
+        Zet één woord om naar token-ID's met greedy longest match.
+        """
+        w_tok = []
+        i = 0
+        while i < len(w):
+            node = self.trie
+            match_id = None
+            match_end = i
+            # Volg de trie zo ver mogelijk en onthoud het laatste (langste) token dat gevonden is
+            for j in range(i, len(w)):
+                node = node.get(w[j])
+                if node is None:
+                    break
+                if None in node:
+                    match_id = node[None]
+                    match_end = j + 1
+            if match_id is None:
+                # Onbekend karakter, geeft net als voorheen een KeyError
+                w_tok.append(self.tok_to_id[w[i]])
+                i += 1
+            else:
+                w_tok.append(match_id)
+                i = match_end
+        return w_tok
+
+    def merge_word(self, w):
+        """
+        Zet één woord om naar token-ID's door de merges in volgorde van rang toe te passen.
+        De tokens staan in een gelinkte lijst en de aangrenzende paren in een heap op (rang, positie),
+        zodat elke merge O(log L) kost. Bij gelijke rang wordt de meest linkse eerst samengevoegd,
+        net als in encoder.
+        """
+        ids = [self.tok_to_id[c] for c in w]
+        n = len(ids)
+        next_pos = list(range(1, n + 1))
+        prev_pos = list(range(-1, n - 1))
+
+        heap = []
+        for i in range(n - 1):
+            rank = self.merges.get((ids[i], ids[i + 1]))
+            if rank is not None:
+                heap.append((rank, i))
+        heapq.heapify(heap)
+
+        while heap:
+            rank, i = heapq.heappop(heap)
+            j = next_pos[i]
+            # Sla verouderde paren over (token al samengevoegd of buurman veranderd)
+            if ids[i] is None or j >= n or self.merges.get((ids[i], ids[j])) != rank:
+                continue
+
+            # Het token-ID van de merge is gelijk aan de rang
+            ids[i] = rank
+            ids[j] = None
+            next_pos[i] = next_pos[j]
+            if next_pos[i] < n:
+                prev_pos[next_pos[i]] = i
+
+            # Nieuwe paren met de linker- en rechterbuur
+            p = prev_pos[i]
+            if p >= 0:
+                new_rank = self.merges.get((ids[p], ids[i]))
+                if new_rank is not None:
+                    heapq.heappush(heap, (new_rank, p))
+            k = next_pos[i]
+            if k < n:
+                new_rank = self.merges.get((ids[i], ids[k]))
+                if new_rank is not None:
+                    heapq.heappush(heap, (new_rank, i))
+
+        return [t for t in ids if t is not None]
+
+    def tokenize(self, words):
+        """
+        Zet een lijst van woorden om naar een lijst van token-ID's per woord.
+
+        Parameters:
+            words : lijst met woorden
+
+        Returns:
+            words_tokens : lijst van woorden, elk woord is een lijst van token-ID's
+        """
+        return [self.tokenize_word(w) for w in words]
+
+
 def decode(tokens_list, id_to_tok):
     """
     Zet een lijst van token-ID's terug om naar tekst.
@@ -162,7 +882,7 @@ def decode(tokens_list, id_to_tok):
     return " ".join(words)
     
 def load_tok_file(tok_file):
-    """Lees een .tok bestand (lijst van token-ID's)
+    """Lees een .tok bestand (lijst van token-ID's), als tekst of in het binaire formaat (zie save_tok_bin)
 
     Parameters:
         tok_file : pad naar het .tok bestand
@@ -170,6 +890,9 @@ def load_tok_file(tok_file):
     Returns:
         tokenized_data : lijst van token-ID's
     """
+    if is_tok_bin(tok_file):
+        return [w for w in load_tok_bin(tok_file).tolist() if w]
+
     tokenized_data = []
     with open(tok_file, 'r', encoding='utf-8') as f:
         for line in f:
@@ -178,6 +901,262 @@ def load_tok_file(tok_file):
                 tokenized_data.append(list(map(int, line.split())))
     return tokenized_data
 
+
+# Binaire bestanden met numpy arrays: 8 bytes magic, lengte van de header, een JSON header met de
+# metadata en per array het dtype, de shape en de positie, en daarna de arrays zelf (uitgelijnd op
+# 64 bytes), zodat ze met numpy.memmap geopend kunnen worden zonder ze te kopiëren.
+ARRAY_ALIGN = 64
+
+
+def save_arrays(path, magic, arrays, meta=None):
+    """
+    Schrijf een aantal numpy arrays met metadata naar één binair bestand.
+
+    Parameters:
+        path : pad van het outputbestand
+        magic : 8 bytes die het soort bestand aangeven
+        arrays : dict van naam:numpy array (ook een memmap kan, die wordt in stukken weggeschreven)
+        meta : dict met metadata die naar JSON omgezet kan worden
+    """
+    header = {"meta": meta or {}, "arrays": {}}
+    pos = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": pos}
+        pos += -(-arr.nbytes // ARRAY_ALIGN) * ARRAY_ALIGN
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(magic) + 8 + len(header_bytes)) // ARRAY_ALIGN) * ARRAY_ALIGN
+
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            # Vul op tot de positie van de array
+            f.write(b"\0" * (data_start + header["arrays"][name]["offset"] - f.tell()))
+            flat = arr.reshape(-1)
+            for start in range(0, len(flat), 1 << 24):
+                f.write(np.ascontiguousarray(flat[start:start + (1 << 24)]).tobytes())
+
+
+def load_arrays(path, magic, mmap=True):
+    """
+    Lees een bestand dat met save_arrays geschreven is.
+
+    Parameters:
+        path : pad naar het bestand
+        magic : de verwachte 8 bytes aan het begin van het bestand
+        mmap : open de arrays met numpy.memmap (alleen-lezen) in plaats van ze in te lezen
+
+    Returns:
+        meta : dict met metadata
+        arrays : dict van naam:numpy array
+    """
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is geen geldig bestand van dit type (verwacht {magic!r})")
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        data_start = -(-(len(magic) + 8 + header_len) // ARRAY_ALIGN) * ARRAY_ALIGN
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            shape = tuple(info["shape"])
+            count = math.prod(shape)
+            if count == 0:
+                # Lege arrays kunnen niet gememmapt worden
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + info["offset"],
+                                         shape=shape)
+            else:
+                f.seek(data_start + info["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return header["meta"], arrays
+
+
+def has_magic(path, magic):
+    """
+    Controleer of een bestand begint met de gegeven magic bytes.
+    """
+    with open(path, "rb") as f:
+        return f.read(len(magic)) == magic
+
+
+# Binair .tok formaat: alle token-ID's achter elkaar (uint16, of uint32 bij meer dan 65535 tokens)
+# en per woord de positie waar het begint (offsets, lengte aantal woorden + 1, uint32 of uint64)
+TOK_MAGIC = b"NLPTOKB1"
+
+
+def token_dtype(max_id):
+    """
+    Kies het kleinste unsigned integer type waar alle token-ID's in passen.
+    """
+    return np.dtype(np.uint16) if max_id < 1 << 16 else np.dtype(np.uint32)
+
+
+def is_tok_bin(tok_file):
+    """
+    Geef True als het .tok bestand in het binaire formaat is.
+    """
+    return has_magic(tok_file, TOK_MAGIC)
+
+
+class TokArray(Sequence):
+    """
+    Getokenizeerde tekst uit een binair .tok bestand. tokens bevat alle token-ID's achter elkaar en
+    offsets per woord de start in tokens. Een woord opvragen geeft een numpy view, zonder kopie.
+    """
+
+    def __init__(self, tokens, offsets):
+        self.tokens = tokens
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def tolist(self):
+        """
+        Zet om naar een lijst van woorden met elk een lijst van token-ID's (zoals load_tok_file).
+        """
+        tokens = self.tokens.tolist()
+        offsets = self.offsets.tolist()
+        return [tokens[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def load_tok_bin(tok_file, mmap=True):
+    """
+    Open een binair .tok bestand.
+
+    Parameters:
+        tok_file : pad naar het binaire .tok bestand
+        mmap : open de arrays met numpy.memmap, zonder ze in te lezen
+
+    Returns:
+        TokArray met de token-ID's per woord
+    """
+    _, arrays = load_arrays(tok_file, TOK_MAGIC, mmap)
+    return TokArray(arrays["tokens"], arrays["offsets"])
+
+
+class TokBinWriter:
+    """
+    Schrijft getokenizeerde woorden in het binaire .tok formaat, woord voor woord, zonder alles in het
+    geheugen te houden. De tokens en offsets worden eerst in stukken naar tijdelijke bestanden
+    geschreven en bij close samengevoegd tot het binaire bestand. Als het with-blok met een exceptie
+    eindigt worden de tijdelijke bestanden weggegooid en wordt er niets geschreven.
+    """
+
+    def __init__(self, path, max_id):
+        self.path = path
+        self.dtype = token_dtype(max_id)
+        self.tokens = array("H" if self.dtype == np.uint16 else "I")
+        self.lengths = array("Q")
+        self.tokens_file = tempfile.TemporaryFile()
+        self.lengths_file = tempfile.TemporaryFile()
+
+    def write_word(self, w_tok):
+        self.tokens.extend(w_tok)
+        self.lengths.append(len(w_tok))
+        if len(self.tokens) >= 1 << 20:
+            self.flush()
+
+    def write_words(self, words_tokens):
+        for w_tok in words_tokens:
+            self.write_word(w_tok)
+
+    def flush(self):
+        self.tokens.tofile(self.tokens_file)
+        self.lengths.tofile(self.lengths_file)
+        del self.tokens[:]
+        del self.lengths[:]
+
+    def close(self):
+        self.flush()
+        arrays = {}
+        for name, f, dtype in [("tokens", self.tokens_file, self.dtype), ("lengths", self.lengths_file, np.uint64)]:
+            f.flush()
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                arrays[name] = np.memmap(f, dtype=dtype, mode="r")
+            else:
+                arrays[name] = np.zeros(0, dtype=dtype)
+
+        # offsets: cumulatieve som van de woordlengtes, met 0 ervoor (uint32 zolang dat past)
+        offset_dtype = np.uint32 if len(arrays["tokens"]) < 1 << 32 else np.uint64
+        offsets = np.zeros(len(arrays["lengths"]) + 1, dtype=offset_dtype)
+        np.cumsum(arrays["lengths"], out=offsets[1:], dtype=offset_dtype)
+        save_arrays(self.path, TOK_MAGIC, {"tokens": arrays["tokens"], "offsets": offsets},
+                    {"words": len(offsets) - 1})
+        del arrays
+        self.discard()
+
+    def discard(self):
+        """
+        Gooi de tijdelijke bestanden weg zonder het binaire bestand te schrijven.
+        """
+        self.tokens_file.close()
+        self.lengths_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+def save_tok_bin(words_tokens, path, max_id=None):
+    """
+    Sla getokenizeerde woorden op in het binaire .tok formaat.
+
+    Parameters:
+        words_tokens : lijst van woorden, elk woord is een lijst van token-ID's
+        path : pad van het outputbestand
+        max_id : hoogste token-ID (bepaalt uint16 of uint32), wordt anders uit de data gehaald
+    """
+    if max_id is None:
+        max_id = max((max(w) for w in words_tokens if len(w)), default=0)
+    with TokBinWriter(path, max_id) as writer:
+        writer.write_words(words_tokens)
+
+
+def tok_text_to_bin(tok_file, bin_file, max_id=None):
+    """
+    Zet een .tok tekstbestand om naar het binaire formaat, regel voor regel.
+    Zonder max_id wordt het bestand eerst één keer gelezen om het hoogste token-ID te bepalen.
+    """
+    if max_id is None:
+        max_id = 0
+        with open(tok_file, "r", encoding="utf-8") as f:
+            for line in f:
+                max_id = max([max_id] + [int(t) for t in line.split()])
+
+    with TokBinWriter(bin_file, max_id) as writer, open(tok_file, "r", encoding="utf-8") as f:
+        for line in f:
+            writer.write_word([int(t) for t in line.split()])
+
+
+def tok_bin_to_text(bin_file, tok_file):
+    """
+    Zet een binair .tok bestand om naar het tekstformaat (één woord per regel, token-ID's gescheiden
+    door spaties).
+    """
+    data = load_tok_bin(bin_file)
+    with open(tok_file, "w", encoding="utf-8") as f:
+        for w in data:
+            f.write(" ".join(map(str, w.tolist())) + "\n")
+
+
 def file_merger(list_of_files):
     """
     Deze functie zet een lijst met filepaths om naar gezamenlijke lijst met met woorden en de hoeveelheid woorder per bestand.
@@ -206,7 +1185,7 @@ def file_merger(list_of_files):
     return final_list_of_words, list_of_len_per_file
 
 
-def group_encoder(max_tokens,min_freq,list_of_words,list_of_doc_len):
+def group_encoder(max_tokens,min_freq,list_of_words,list_of_doc_len,workers=1):
     """
     Deze functie gebruikt de encoder functie op alle bestanden zodat hier een gezamenlijk tokenizatie op word toegepast.
     en splitst de lijst met woorden terug naar de lijsten met woorden per bestand, maar dan getokeniseerd
@@ -215,128 +1194,775 @@ def group_encoder(max_tokens,min_freq,list_of_words,list_of_doc_len):
     Param: min freq, minimale freqwentie dat nodig is om een token te defineren
     Param: list_of_words, voledige lijst met woorden
     Param: list_of_doc_len, lijst met de lengte van de hoeveelheid woorden per bestand
+    Param: workers, aantal processen voor het leren van de BPE (default 1)
 
     return: uncoupled_token_list_per_doc, lijst[document] van lijsten[woorden in tokens]
     return groupt_token_dict, key = token, value = woorden/letters
     """
     uncoupled_token_lists_per_doc = []
 
-    groupt_list_of_words, groupt_token_dict = encoder(list_of_words,max_tokens,min_freq)
+    groupt_list_of_words, groupt_token_dict = incremental_encoder(list_of_words,max_tokens,min_freq,workers=workers)
     start = 0
     stop = 0
-    # uncoupeling based on old len per doc
+    # uncoupeling based on old len per doc, alle woorden van elk document (ook het laatste)
     for len_index in range(len(list_of_doc_len)):
-        current_len = list_of_doc_len[len_index]-1
+        current_len = list_of_doc_len[len_index]
         stop = current_len + start
         words_in_file = groupt_list_of_words[start:stop]
         uncoupled_token_lists_per_doc.append(words_in_file)
-        start = stop+1
+        start = stop
 
     return uncoupled_token_lists_per_doc, groupt_token_dict
 
 
-def multi_hot_encoding(token_lists,tokens_dict,list_of_names):
+def token_columns(tokens_dict):
     """
-    Deze functie genereerd een multi-hot encoding dataframe
+    Maak een lookup-array van token-ID naar kolomindex in de volgorde van tokens_dict, -1 voor ID's die
+    niet in tokens_dict staan.
+
+    param: token_dict {key, int token: value, str token strings}
+    return: numpy array met per token-ID de kolomindex
+    """
+    keys = np.fromiter(tokens_dict.keys(), dtype=np.int64, count=len(tokens_dict))
+    columns = np.full(int(keys.max()) + 1 if len(keys) else 0, -1, dtype=np.int64)
+    columns[keys] = np.arange(len(keys))
+    return columns
+
+
+def document_row(words, columns):
+    """
+    Tel voor één document in hoeveel woorden elk token voorkomt (een woord met een token twee keer
+    telt één keer, net als 'key in woord'), in één gevectoriseerde telling over alle tokens.
+
+    param: words [list[tokens, int]] woorden van het document
+    param: columns lookup-array van token-ID naar kolomindex, zie token_columns
+    return: kolomindexen en tellingen van de tokens die voorkomen (numpy arrays)
+    """
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    flat = np.fromiter((tok for word in words for tok in word), dtype=np.int64, count=int(lengths.sum()))
+    flat_columns = np.full(len(flat), -1, dtype=np.int64)
+    in_range = flat < len(columns)
+    flat_columns[in_range] = columns[flat[in_range]]
+    word_index = np.repeat(np.arange(len(words), dtype=np.int64), lengths)
+
+    known = flat_columns >= 0
+    # elk (woord, token) paar één keer, daarna per token tellen
+    pairs = np.unique(word_index[known] * len(columns) + flat_columns[known])
+    counts = np.bincount(pairs % max(len(columns), 1), minlength=len(columns))
+    present = np.flatnonzero(counts)
+    return present, counts[present]
+
+
+def document_term_matrix(token_lists,tokens_dict):
+    """
+    Bouw een sparse document-term matrix: per document (rij) en token (kolom, volgorde van tokens_dict)
+    het aantal woorden in het document waar het token in voorkomt. Elk document wordt één keer
+    doorlopen in plaats van één keer per token.
 
     param: token_lists [file[list[tokens, int]]]
     param: token_dict {key, int token: value, str token strings}
-    param: list_of_names [str, filenames]
-    return: df pandas dataframe with rows=tokens cols=files, values = 0 or 1
-    """    
-    def word_checker(current_token_lists,key):
+    return: scipy.sparse.csr_matrix (documenten x tokens) met tellingen
+    """
+    columns = token_columns(tokens_dict)
+    indptr = [0]
+    indices = []
+    data = []
+    for words in token_lists:
+        present, counts = document_row(words, columns)
+        indices.append(present)
+        data.append(counts)
+        indptr.append(indptr[-1] + len(present))
+
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=np.int64)
+    return sparse.csr_matrix((data, indices, np.array(indptr, dtype=np.int64)),
+                             shape=(len(token_lists), len(tokens_dict)))
+
+
+def multi_hot_matrix(dtm):
+    """
+    Multi-hot encoding van een document-term matrix: 1 als het token in het document voorkomt, anders 0.
+    """
+    return (dtm > 0).astype(np.int64)
+
+
+def frequency_matrix(dtm,result_type,total_token_counter=None):
+    """
+    Frequency encoding van een document-term matrix: de tellingen, of als fractie/percentage van het
+    totaal aantal tellingen over alle documenten (zoals frequency_checker).
+
+    param: total_token_counter totaal aantal tellingen, default de som van dtm (geef het totaal van de
+           hele matrix mee als dtm maar een deel van de rijen is)
+    """
+    dtm = sparse.csr_matrix(dtm, dtype=np.int64)
+    if total_token_counter is None:
+        total_token_counter = dtm.sum()
+    if result_type not in ("frac", "perc"):
+        return dtm
+    # deel de waarden die niet 0 zijn zelf, scipy vermenigvuldigt met 1/totaal en rondt daardoor anders af
+    result = dtm.astype(np.float64)
+    result.data = dtm.data / total_token_counter
+    if result_type == "perc":
+        result.data = result.data * 100
+    return result
+
+
+def idf_weights(token_totals):
+    """
+    De idf van elk token zoals in tf_idf_calc: log(totaal aantal tellingen / tellingen van het token),
+    0 voor tokens die nergens voorkomen.
+
+    param: token_totals numpy array met per token de tellingen over alle documenten
+    return: numpy array met de idf per token
+    """
+    token_totals = np.asarray(token_totals, dtype=np.float64)
+    sum_of_all_tokens = token_totals.sum()
+    idf = np.zeros(len(token_totals))
+    present = token_totals > 0
+    # math.log per token (V waarden) zodat de uitkomst bit voor bit gelijk is aan tf_idf_calc, np.log rondt soms anders af
+    idf[present] = [math.log(ratio) for ratio in (sum_of_all_tokens / token_totals[present]).tolist()]
+    return idf
+
+
+def tf_idf_matrix(dtm,token_totals=None,doc_totals=None):
+    """
+    TF-IDF van een document-term matrix, gevectoriseerd op dezelfde manier als tf_idf_calc: het aandeel
+    van het token in het document maal log(totaal aantal tellingen / tellingen van het token), 0 voor
+    tokens die nergens voorkomen.
+
+    param: dtm scipy.sparse matrix (documenten x tokens) met tellingen
+    param: token_totals tellingen per token over alle documenten, default de kolomsommen van dtm
+    param: doc_totals tellingen per document (rij van dtm), default de rijsommen van dtm
+    """
+    dtm = sparse.csr_matrix(dtm, dtype=np.float64)
+    if doc_totals is None:
+        doc_totals = np.asarray(dtm.sum(axis=1)).ravel()
+    doc_totals = np.asarray(doc_totals, dtype=np.float64)
+    if token_totals is None:
+        token_totals = np.asarray(dtm.sum(axis=0)).ravel()
+    idf = idf_weights(token_totals)
+
+    # tf: deel elke waarde door het totaal van zijn document, daarna maal de idf van zijn token
+    result = dtm.copy()
+    rows = np.repeat(np.arange(dtm.shape[0]), np.diff(dtm.indptr))
+    result.data = dtm.data / doc_totals[rows] * idf[dtm.indices]
+    result.eliminate_zeros()
+    return result
+
+
+def matrix_to_df(matrix,tokens_dict,list_of_names):
+    """
+    Zet een (documenten x tokens) matrix om naar een dataframe met rows=tokens en cols=files.
+    """
+    return pd.DataFrame(matrix.T.toarray(), index=list(tokens_dict.keys()), columns=list(list_of_names))
+
+
+def bow_matrix(dtm,type_of_bag,result_type="count",token_totals=None,doc_totals=None):
+    """
+    Zet een document-term matrix om naar de gekozen bag-of-words encoding.
+
+    param: dtm scipy.sparse matrix (documenten x tokens), zie document_term_matrix
+    param: type_of_bag 'multi', 'freq' of 'tfidf'
+    param: result_type alleen bij 'freq': 'count', 'frac' of 'perc'
+    param: token_totals, doc_totals tellingen per token en per document als dtm een deel van de rijen van
+           een grotere matrix is (zie stream_bow_matrix), default berekend uit dtm
+    return: scipy.sparse.csr_matrix
+    """
+    if type_of_bag == "multi":
+        return multi_hot_matrix(dtm)
+    if type_of_bag == "freq":
+        total = None if token_totals is None else np.asarray(token_totals, dtype=np.int64).sum()
+        return frequency_matrix(dtm, result_type, total)
+    return tf_idf_matrix(dtm, token_totals, doc_totals)
+
+
+# Binair formaat voor een sparse matrix (CSR): indptr, indices en data in een save_arrays bestand
+DTM_MAGIC = b"NLPDTMB1"
+
+
+class SparseRowWriter:
+    """
+    Schrijft een sparse matrix (CSR) rij voor rij naar schijf, zonder alle rijen in het geheugen te
+    houden. Net als TokBinWriter gaan de kolomindexen en waarden eerst in stukken naar tijdelijke
+    bestanden en worden ze bij close samengevoegd tot één binair bestand (zie load_sparse). Net als bij
+    TokBinWriter wordt er bij een exceptie in het with-blok niets geschreven.
+
+    Parameters:
+        path : pad van het outputbestand
+        num_columns : aantal kolommen van de matrix
+        meta : dict met metadata die naar JSON omgezet kan worden
+        dtype : dtype van de waarden (default int64, voor tellingen)
+    """
+
+    def __init__(self, path, num_columns, meta=None, dtype=np.int64):
+        self.path = path
+        self.num_columns = num_columns
+        self.meta = meta or {}
+        self.dtype = np.dtype(dtype)
+        self.indices = []
+        self.data = []
+        self.buffered = 0
+        self.lengths = array("Q")
+        self.indices_file = tempfile.TemporaryFile()
+        self.data_file = tempfile.TemporaryFile()
+
+    def write_row(self, indices, data):
+        self.indices.append(np.asarray(indices, dtype=np.int32))
+        self.data.append(np.asarray(data, dtype=self.dtype))
+        self.lengths.append(len(indices))
+        self.buffered += len(indices)
+        if self.buffered >= 1 << 20:
+            self.flush()
+
+    def write_rows(self, matrix):
         """
-        deze functie checkt of de key in de lijst met tokenlijsten zit
-        Return: boolean
+        Schrijf alle rijen van een scipy.sparse matrix in één keer (een blok rijen van een grotere matrix).
         """
-        result = False
-        for word_index in range(len(current_token_lists)):
-            current_word_in_tokens = current_token_lists[word_index]
-            if key in current_word_in_tokens:
-                result = True
+        matrix = sparse.csr_matrix(matrix)
+        matrix.sort_indices()
+        self.indices.append(matrix.indices.astype(np.int32))
+        self.data.append(matrix.data.astype(self.dtype))
+        self.lengths.extend(np.diff(matrix.indptr).tolist())
+        self.buffered += matrix.nnz
+        if self.buffered >= 1 << 20:
+            self.flush()
+
+    def flush(self):
+        if self.indices:
+            np.concatenate(self.indices).tofile(self.indices_file)
+            np.concatenate(self.data).tofile(self.data_file)
+        self.indices = []
+        self.data = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        arrays = {}
+        for name, f, dtype in [("indices", self.indices_file, np.int32), ("data", self.data_file, self.dtype)]:
+            f.flush()
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                arrays[name] = np.memmap(f, dtype=dtype, mode="r")
             else:
-                continue
+                arrays[name] = np.zeros(0, dtype=dtype)
 
-        return result
-    
-    data = {}
-    row_list = []
-    
-    for file_index in range(len(list_of_names)):
-        file_name = list_of_names[file_index]
-        data[file_name] = []
-
-    for key in tokens_dict.keys():
-        row_list.append(key)
-        for file_index in range(len(list_of_names)):
-            current_file = list_of_names[file_index]
-            current_token_list = token_lists[file_index]
-            bool_check = word_checker(current_token_list,key)
-            if bool_check == True:
-                old_list = data.get(current_file)
-                old_list.append(1)
-                data[current_file] = old_list
-            else:
-                old_list = data.get(current_file)
-                old_list.append(0)
-                data[current_file] = old_list
+        indptr = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.lengths, dtype=np.uint64), out=indptr[1:], dtype=np.int64)
+        meta = dict(self.meta, shape=[len(self.lengths), self.num_columns])
+        save_arrays(self.path, DTM_MAGIC, {"indptr": indptr, "indices": arrays["indices"], "data": arrays["data"]}, meta)
+        del arrays
+        self.discard()
 
-    df = pd.DataFrame(data, index=row_list)
+    def discard(self):
+        """
+        Gooi de tijdelijke bestanden weg zonder het binaire bestand te schrijven.
+        """
+        self.indices_file.close()
+        self.data_file.close()
 
+    def __enter__(self):
+        return self
 
-    return df
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self.discard()
+        else:
+            self.close()
 
 
-def frequency_checker(token_lists,tokens_dict,list_of_names,result_type):
+def save_sparse(path, matrix, meta=None):
     """
-    Deze functie telt de hoeveelheid keren dat een token voorkomt in een bestand
-    param: token_lists [file[list[tokens, int]]]
+    Sla een scipy.sparse matrix op in het binaire CSR formaat (zie SparseRowWriter).
+    """
+    matrix = sparse.csr_matrix(matrix)
+    meta = dict(meta or {}, shape=list(matrix.shape))
+    save_arrays(path, DTM_MAGIC, {"indptr": matrix.indptr, "indices": matrix.indices, "data": matrix.data}, meta)
+
+
+def load_sparse(path, mmap=True):
+    """
+    Open een sparse matrix van SparseRowWriter of save_sparse.
+
+    Parameters:
+        path : pad naar het bestand
+        mmap : open de arrays met numpy.memmap, zonder ze in te lezen
+
+    Returns:
+        matrix : scipy.sparse.csr_matrix
+        meta : dict met metadata
+    """
+    meta, arrays = load_arrays(path, DTM_MAGIC, mmap)
+    matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(meta["shape"]),
+                               copy=False)
+    return matrix, meta
+
+
+# Outputformaten voor bag-of-words matrices (save_bow) met hun standaard extensie
+BOW_FORMATS = {"bowb": ".bowb", "npz": ".npz", "mtx": ".mtx", "parquet": ".parquet"}
+
+
+def check_names(names):
+    """
+    Controleer dat geen van de namen een regeleinde bevat (zie write_names).
+    """
+    for name in names:
+        if "\n" in name or "\r" in name:
+            raise ValueError(f"naam {name!r} bevat een regeleinde en kan niet als regel opgeslagen worden")
+
+
+def write_names(path, names):
+    """
+    Schrijf namen (documenten of tokens) naar een tekstbestand, één per regel. Een naam met een regeleinde
+    erin zou bij het lezen alle volgende namen verschuiven, die wordt daarom geweigerd (ValueError).
+    """
+    check_names(names)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.writelines(f"{name}\n" for name in names)
+
+
+def read_names(path):
+    """
+    Lees namen die met write_names geschreven zijn.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def names_from_index(index, names):
+    """
+    Zet de namen uit een lange tabel (index, naam per waarde) om naar een lijst met de naam van elke index.
+    """
+    result = [""] * (int(index.max()) + 1 if len(index) else 0)
+    for i, name in zip(index.tolist(), names):
+        result[i] = name
+    return result
+
+
+def save_bow(path, matrix, row_names, column_names, fmt="bowb", meta=None):
+    """
+    Sla een bag-of-words matrix (documenten x tokens) op in een compact, machineleesbaar formaat, met de
+    documentnamen en tokens erbij. Te lezen met load_bow.
+
+    Formaten:
+        - bowb: binair CSR formaat van save_sparse, de namen staan in de metadata (memory mapped te openen)
+        - npz: gecomprimeerd numpy archief met dezelfde arrays als scipy.sparse.save_npz (ook te lezen met
+          scipy.sparse.load_npz) plus 'rows' en 'columns'
+        - mtx: Matrix Market (scipy.io.mmwrite), de namen in <path>.rows en <path>.columns (één per regel,
+          namen met een regeleinde worden geweigerd)
+        - parquet: lange tabel (document_index, document, token_index, token, value) met alleen de waarden
+          die niet 0 zijn; document en token zijn de namen als strings (ook dubbele namen), de indexen de rij
+          en kolom in de matrix. Alle namen (ook van lege rijen en kolommen) staan als JSON lijsten in de
+          key-value metadata van het bestand ('rows' en 'columns'). Vereist pyarrow
+
+    Parameters:
+        path : pad van het outputbestand
+        matrix : scipy.sparse matrix (documenten x tokens)
+        row_names : namen van de documenten
+        column_names : tokens (strings)
+        fmt : een van BOW_FORMATS
+        meta : extra metadata (alleen bij bowb)
+    """
+    matrix = sparse.csr_matrix(matrix)
+    row_names = [str(name) for name in row_names]
+    column_names = [str(name) for name in column_names]
+
+    if fmt == "npz":
+        # via een open bestand, anders zet numpy er zelf .npz achter
+        with open(path, "wb") as f:
+            np.savez_compressed(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                                format=matrix.format.encode("ascii"), shape=np.array(matrix.shape),
+                                rows=np.array(row_names, dtype=str), columns=np.array(column_names, dtype=str))
+    elif fmt == "mtx":
+        check_names(row_names)
+        check_names(column_names)
+        with open(path, "wb") as f:
+            mmwrite(f, matrix)
+        write_names(path + ".rows", row_names)
+        write_names(path + ".columns", column_names)
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        coo = matrix.tocoo()
+        table = pa.table({
+            "document_index": coo.row.astype(np.int64),
+            "document": pa.array(np.array(row_names, dtype=object)[coo.row], type=pa.string()),
+            "token_index": coo.col.astype(np.int64),
+            "token": pa.array(np.array(column_names, dtype=object)[coo.col], type=pa.string()),
+            "value": coo.data,
+        })
+        table = table.replace_schema_metadata({"rows": json.dumps(row_names), "columns": json.dumps(column_names)})
+        pq.write_table(table, path)
+    elif fmt == "bowb":
+        save_sparse(path, matrix, dict(meta or {}, rows=row_names, columns=column_names))
+    else:
+        raise ValueError(f"onbekend formaat {fmt}, kies uit {', '.join(BOW_FORMATS)}")
+
+
+def load_bow(path):
+    """
+    Lees een bag-of-words matrix die met save_bow opgeslagen is. Het formaat wordt aan het begin van
+    het bestand herkend.
+
+    Parameters:
+        path : pad naar het bestand
+
+    Returns:
+        matrix : scipy.sparse.csr_matrix (documenten x tokens)
+        row_names : namen van de documenten
+        column_names : tokens
+    """
+    with open(path, "rb") as f:
+        start = f.read(16)
+
+    if start.startswith(DTM_MAGIC):
+        matrix, meta = load_sparse(path)
+        return matrix, meta.get("rows"), meta.get("columns")
+    if start.startswith(b"PK"):
+        with np.load(path) as archive:
+            matrix = sparse.csr_matrix((archive["data"], archive["indices"], archive["indptr"]),
+                                       shape=tuple(archive["shape"]))
+            return matrix, archive["rows"].tolist(), archive["columns"].tolist()
+    if start.startswith(b"%%MatrixMarket"):
+        matrix = sparse.csr_matrix(mmread(path))
+        return matrix, read_names(path + ".rows"), read_names(path + ".columns")
+    if start.startswith(b"PAR1"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        row_index = table["document_index"].to_numpy()
+        column_index = table["token_index"].to_numpy()
+        if b"rows" in metadata and b"columns" in metadata:
+            rows = json.loads(metadata[b"rows"])
+            columns = json.loads(metadata[b"columns"])
+        else:
+            # zonder metadata (bijv. door een ander programma herschreven): de namen uit de tabel, lege
+            # rijen en kolommen aan het eind gaan dan verloren en lege rijen of kolommen ertussen heten ''
+            rows = names_from_index(row_index, table["document"].to_pylist())
+            columns = names_from_index(column_index, table["token"].to_pylist())
+        matrix = sparse.csr_matrix((table["value"].to_numpy(), (row_index, column_index)),
+                                   shape=(len(rows), len(columns)))
+        return matrix, rows, columns
+    raise ValueError(f"{path} is geen bag-of-words bestand van save_bow")
+
+
+def word_type_counter(list_of_files):
+    """
+    Tel de unieke woorden van alle bestanden, bestand voor bestand in stukken gelezen (iter_words).
+    De volgorde is die van het eerste voorkomen, net als bij Counter(file_merger(...)[0]), dus
+    incremental_encoder leert hiermee dezelfde vocabulaire.
+
+    param: list_of_files [string filepaths]
+    return: Counter van woord:frequentie
+    """
+    word_counts = Counter()
+    for file_path in list_of_files:
+        word_counts.update(iter_words(file_path))
+    return word_counts
+
+
+def stream_document_term_matrix(list_of_files,tokenizer,tokens_dict,path):
+    """
+    Bouw de document-term matrix (zie document_term_matrix) document voor document: elk bestand wordt
+    in stukken gelezen, met de tokenizer omgezet en als één rij naar schijf geschreven, zodat het
+    aantal documenten niet door het geheugen begrensd wordt.
+
+    param: list_of_files [string filepaths]
+    param: tokenizer Tokenizer met de vocabulaire van tokens_dict (onbekende karakters worden overgeslagen)
     param: token_dict {key, int token: value, str token strings}
-    param: list_of_names [str, filenames]
-    return: df pandas dataframe with rows=tokens cols=files, values = count per key
+    param: path pad van het binaire matrixbestand (zie load_sparse)
+    return: tellingen per token over alle documenten en tellingen per document (numpy arrays), voor
+            stream_bow_matrix
+    """
+    columns = token_columns(tokens_dict)
+    token_totals = np.zeros(len(tokens_dict), dtype=np.int64)
+    doc_totals = np.zeros(len(list_of_files), dtype=np.int64)
+    with SparseRowWriter(path, len(tokens_dict), {"rows": list(list_of_files)}) as writer:
+        for i, file_path in enumerate(list_of_files):
+            words = [tokenizer.tokenize_known(w) for w in iter_words(file_path)]
+            present, counts = document_row(words, columns)
+            writer.write_row(present, counts)
+            token_totals[present] += counts
+            doc_totals[i] = counts.sum()
+    return token_totals, doc_totals
+
+
+def stream_bow_matrix(dtm_file, path, type_of_bag, result_type, token_totals, doc_totals, meta=None,
+                      batch_rows=1024):
+    """
+    Zet een document-term matrix op schijf (van stream_document_term_matrix) om naar de gekozen
+    bag-of-words encoding (zie bow_matrix), in blokken van batch_rows rijen: elk blok wordt uit de memory
+    mapped matrix gelezen, met de tellingen van de hele matrix omgezet en met een SparseRowWriter
+    weggeschreven, zodat nooit de hele matrix in het geheugen staat.
+
+    param: dtm_file binair matrixbestand met tellingen (zie load_sparse)
+    param: path pad van het binaire outputbestand (bowb, zie save_bow en load_bow)
+    param: type_of_bag, result_type zie bow_matrix
+    param: token_totals, doc_totals tellingen per token en per document, zie stream_document_term_matrix
+    param: meta metadata voor het outputbestand
+    param: batch_rows aantal rijen per blok
+    """
+    dtm, _ = load_sparse(dtm_file)
+    dtype = bow_matrix(dtm[:0], type_of_bag, result_type, token_totals, doc_totals[:0]).dtype
+    with SparseRowWriter(path, dtm.shape[1], meta, dtype) as writer:
+        for start in range(0, dtm.shape[0], batch_rows):
+            end = start + batch_rows
+            writer.write_rows(bow_matrix(dtm[start:end], type_of_bag, result_type, token_totals,
+                                         doc_totals[start:end]))
+    del dtm
+
+
+# Binair formaat van een TfIdfIndex (zie TfIdfIndex.save)
+INDEX_MAGIC = b"NLPTFIX1"
+
+
+class TfIdfIndex:
+    """
+    Index van documenten voor TF-IDF die bijgewerkt kan worden zonder alles opnieuw te berekenen. Per
+    document worden de tellingen van de tokens bewaard (zoals een rij van document_term_matrix) en voor
+    alle documenten samen de tellingen per token. Een document toevoegen of verwijderen past alleen de
+    tokens van dat document aan (O(grootte van het document)); de TF-IDF matrix wordt pas berekend als
+    die opgevraagd wordt en is gelijk aan die van tf_idf_calc voor dezelfde documenten.
+
+    Attributen:
+        tokens_dict : {key, int token: value, str token strings}, bepaalt de kolommen
+        enc_file : pad naar de vocabulaire waarmee nieuwe documenten getokenized worden (optioneel)
+        docs : dict van documentsleutel: (kolomindexen, tellingen), in volgorde van toevoegen; de sleutel
+               is het absolute, genormaliseerde pad (zie doc_key), zodat 'a.txt' en './a.txt' hetzelfde
+               document zijn
+        labels : dict van documentsleutel: de naam zoals die opgegeven is, voor de output
+        token_totals : tellingen per token over alle documenten
     """
-    def word_counter(current_token_lists,key):
-        """   
-        Telt de hoeveelheid dat de key in de lijst van tokens voorkomt
+
+    def __init__(self, tokens_dict, enc_file=None):
+        self.tokens_dict = tokens_dict
+        self.enc_file = enc_file
+        self.columns = token_columns(tokens_dict)
+        self.docs = {}
+        self.labels = {}
+        self.token_totals = np.zeros(len(tokens_dict), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, name):
+        return self.doc_key(name) in self.docs
+
+    @staticmethod
+    def doc_key(name):
         """
-        count = 0
-        for word_index in range(len(current_token_lists)):
-            current_word_in_tokens = current_token_lists[word_index]
-            if key in current_word_in_tokens:
-                count+=1
-            else:
-                continue
-        return count
-    
+        De naam waaronder een document in de index staat: het absolute, genormaliseerde pad.
+        """
+        return os.path.normpath(os.path.abspath(name))
 
-    
-    data = {}
-    total_token_counter = 0
+    def names(self):
+        return list(self.labels.values())
 
-    for file_index in range(len(list_of_names)):
-        file_name = list_of_names[file_index]
-        data[file_name] = []
-    
-    row_list = []
-    for key in tokens_dict.keys():
-        row_list.append(key)
-        for file_index in range(len(list_of_names)):
-            current_file = list_of_names[file_index]
-            current_token_list = token_lists[file_index]
-            word_count = word_counter(current_token_list,key)
-            total_token_counter += word_count
-            old_list = data.get(current_file)
-            old_list.append(word_count)
-            data[current_file] = old_list
-
-    df = pd.DataFrame(data,index=row_list)
-    if result_type == "frac":
-        df = df / total_token_counter
+    def add(self, name, token_lists):
+        """
+        Voeg een document toe.
 
-    if result_type == "perc":
-        df = df/total_token_counter*100
+        param: name naam van het document (bijv. het bestandspad), moet uniek zijn
+        param: token_lists [list[tokens, int]] woorden van het document
+        """
+        present, counts = document_row(token_lists, self.columns)
+        self.add_counts(name, present, counts)
+
+    def add_counts(self, name, indices, counts):
+        """
+        Voeg een document toe als kolomindexen en tellingen (een rij van document_term_matrix).
+        """
+        key = self.doc_key(name)
+        if key in self.docs:
+            raise ValueError(f"document {name} staat al in de index")
+        indices = np.asarray(indices, dtype=np.int32)
+        counts = np.asarray(counts, dtype=np.int64)
+        self.docs[key] = (indices, counts)
+        self.labels[key] = name
+        self.token_totals[indices] += counts
+
+    def remove(self, name):
+        """
+        Verwijder een document uit de index.
+        """
+        key = self.doc_key(name)
+        if key not in self.docs:
+            raise KeyError(f"document {name} staat niet in de index")
+        del self.labels[key]
+        indices, counts = self.docs.pop(key)
+        self.token_totals[indices] -= counts
+
+    def counts_matrix(self):
+        """
+        De document-term matrix van alle documenten in de index (documenten x tokens).
+        """
+        rows = list(self.docs.values())
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices, _ in rows], out=indptr[1:])
+        indices = np.concatenate([r[0] for r in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([r[1] for r in rows]) if rows else np.zeros(0, dtype=np.int64)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.tokens_dict)))
+
+    def tf_idf(self):
+        """
+        De TF-IDF matrix van alle documenten in de index, met de bijgehouden tellingen per token.
+        """
+        return tf_idf_matrix(self.counts_matrix(), self.token_totals)
 
-    return df
+    def to_df(self):
+        """
+        De TF-IDF matrix als dataframe met rows=tokens en cols=documenten, zoals tf_idf_calc.
+        """
+        return matrix_to_df(self.tf_idf(), self.tokens_dict, self.names())
+
+    def save(self, path):
+        """
+        Sla de index op in één binair bestand (zie nlp.save_arrays).
+        """
+        dtm = self.counts_matrix()
+        arrays = {
+            "indptr": dtm.indptr.astype(np.int64),
+            "indices": dtm.indices.astype(np.int32),
+            "data": dtm.data.astype(np.int64),
+            "token_ids": np.fromiter(self.tokens_dict.keys(), dtype=np.int64, count=len(self.tokens_dict)),
+            "token_totals": self.token_totals,
+        }
+        meta = {"names": self.names(), "keys": list(self.docs.keys()), "tokens": list(self.tokens_dict.values()), "enc": self.enc_file}
+        save_arrays(path, INDEX_MAGIC, arrays, meta)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Laad een index die met save is opgeslagen.
+        """
+        meta, arrays = load_arrays(path, INDEX_MAGIC, mmap=False)
+        tokens_dict = dict(zip(arrays["token_ids"].tolist(), meta["tokens"]))
+        index = cls(tokens_dict, meta["enc"])
+        indptr = arrays["indptr"]
+        for i, (key, name) in enumerate(zip(meta["keys"], meta["names"])):
+            index.labels[key] = name
+            index.docs[key] = (arrays["indices"][indptr[i]:indptr[i + 1]], arrays["data"][indptr[i]:indptr[i + 1]])
+        index.token_totals = arrays["token_totals"].copy()
+        return index
+
+
+class SimilarityIndex:
+    """
+    Zoekt de documenten die het meest op een nieuwe tekst lijken (cosine similarity van de TF-IDF
+    vectoren). De TF-IDF rijen van de documenten worden één keer genormaliseerd (lengte 1) en per token
+    opgeslagen (tokens x documenten, een inverted index), zodat een query alleen de documenten raakt
+    die een token met de query delen: de scores zijn één sparse matrix-vector product.
+
+    Attributen:
+        names : namen van de documenten
+        idf : idf per token (zie idf_weights), wordt ook op de query toegepast
+        postings : scipy.sparse.csr_matrix (tokens x documenten) met de genormaliseerde TF-IDF waarden
+        columns : lookup-array van token-ID naar kolomindex, zie token_columns
+    """
+
+    def __init__(self, dtm, names, tokens_dict, token_totals=None):
+        self.names = list(names)
+        self.columns = token_columns(tokens_dict)
+        if token_totals is None:
+            token_totals = np.asarray(dtm.sum(axis=0)).ravel()
+        self.idf = idf_weights(token_totals)
+        self.postings = normalize_rows(tf_idf_matrix(dtm, token_totals)).T.tocsr()
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        Maak een SimilarityIndex van alle documenten in een TfIdfIndex.
+        """
+        return cls(index.counts_matrix(), index.names(), index.tokens_dict, index.token_totals)
+
+    def query_vector(self, token_lists):
+        """
+        Genormaliseerde TF-IDF vector (1 x tokens) van een nieuw document, met de idf van de index.
+
+        param: token_lists [list[tokens, int]] woorden van het document
+        """
+        present, counts = document_row(token_lists, self.columns)
+        total = counts.sum()
+        values = counts / total * self.idf[present] if total else np.zeros(0)
+        vector = sparse.csr_matrix((values, present, [0, len(present)]), shape=(1, len(self.idf)))
+        return normalize_rows(vector)
+
+    def scores(self, vectors):
+        """
+        Cosine similarity van een of meer query vectoren (queries x tokens) met alle documenten. Het
+        resultaat blijft sparse: alleen documenten die een token met de query delen krijgen een score.
+
+        return: scipy.sparse.csr_matrix (queries x documenten)
+        """
+        scores = sparse.csr_matrix(vectors @ self.postings)
+        scores.eliminate_zeros()
+        scores.sort_indices()
+        return scores
+
+    def query(self, token_lists, k=5):
+        """
+        Geef de k documenten die het meest op een nieuw document lijken.
+
+        param: token_lists [list[tokens, int]] woorden van het document
+        param: k aantal resultaten
+        return: lijst van (documentnaam, cosine similarity), hoogste eerst
+        """
+        return self.top_k(self.scores(self.query_vector(token_lists)), k)
+
+    def top_k(self, scores, k):
+        """
+        De k hoogste scores met hun documentnamen, zonder alle scores te sorteren. Alleen de scores die
+        niet 0 zijn (.data van de sparse rij) worden bekeken, dus er kunnen minder dan k resultaten zijn.
+
+        param: scores één rij van scores (1 x documenten, scipy.sparse)
+        """
+        scores = sparse.csr_matrix(scores)
+        values = scores.data
+        k = min(k, len(values))
+        if k <= 0:
+            return []
+        best = np.argpartition(-values, k - 1)[:k]
+        best = best[np.argsort(-values[best], kind="stable")]
+        return [(self.names[scores.indices[i]], float(values[i])) for i in best]
+
+
+def normalize_rows(matrix):
+    """
+    Deel elke rij van een sparse matrix door zijn lengte (L2), lege rijen blijven 0.
+    """
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    result = matrix.copy()
+    nonzero = norms[rows] > 0
+    result.data[nonzero] = matrix.data[nonzero] / norms[rows][nonzero]
+    return result
+
+
+def multi_hot_encoding(token_lists,tokens_dict,list_of_names):
+    """
+    Deze functie genereerd een multi-hot encoding dataframe
+
+    param: token_lists [file[list[tokens, int]]]
+    param: token_dict {key, int token: value, str token strings}
+    param: list_of_names [str, filenames]
+    return: df pandas dataframe with rows=tokens cols=files, values = 0 or 1
+    """
+    dtm = document_term_matrix(token_lists, tokens_dict)
+    return matrix_to_df(multi_hot_matrix(dtm), tokens_dict, list_of_names)
+
+
+def frequency_checker(token_lists,tokens_dict,list_of_names,result_type):
+    """
+    Deze functie telt de hoeveelheid keren dat een token voorkomt in een bestand
+    param: token_lists [file[list[tokens, int]]]
+    param: token_dict {key, int token: value, str token strings}
+    param: list_of_names [str, filenames]
+    return: df pandas dataframe with rows=tokens cols=files, values = count per key
+    """
+    dtm = document_term_matrix(token_lists, tokens_dict)
+    return matrix_to_df(frequency_matrix(dtm, result_type), tokens_dict, list_of_names)
 
 def build_token_mappings(enc):
     """Maak dicts van token:index en index:token
@@ -354,6 +1980,23 @@ def build_token_mappings(enc):
     return all_tokens, token_to_idx, idx_to_token
 
 
+def build_id_lookup(enc, token_to_idx):
+    """Maak een numpy lookup-tabel van token-ID naar index (zoals token_to_idx[enc[token-ID]]), zodat een
+    hele array met token-ID's in één keer omgezet kan worden met lut[ids]
+
+    Parameters:
+        enc : dict van token-ID:token
+        token_to_idx : dict van token:index
+
+    Returns:
+        lut : numpy array met per token-ID de index, -1 voor ID's die niet in enc of token_to_idx staan
+    """
+    lut = np.full(max(enc, default=-1) + 1, -1, dtype=np.int64)
+    for t_id, tok in enc.items():
+        lut[t_id] = token_to_idx.get(tok, -1)
+    return lut
+
+
 def tf_idf_calc(token_lists,tokens_dict,list_of_names):
     """
     Deze functie maakt een tf_idf dataframe
@@ -363,75 +2006,5 @@ def tf_idf_calc(token_lists,tokens_dict,list_of_names):
     param: list_of_names [str, filenames]
     return: df pandas dataframe with rows=tokens cols=files, values = tf_idf waarde
     """
-    def word_counter(current_token_lists,key):
-        count = 0
-        for word_index in range(len(current_token_lists)):
-            current_word_in_tokens = current_token_lists[word_index]
-            if key in current_word_in_tokens:
-                count+=1
-            else:
-                continue
-        return count
-    
-    data = {}
-    total_token_counter = []
-    dict_list = []
-    result = {}
-
-    for file_index in range(len(list_of_names)):
-        file_name = list_of_names[file_index]
-        data[file_name] = []
-        result[file_name] = []
-        total_token_counter.append(0)
-        empty_dict = {}
-        dict_list.append(empty_dict)
-    
-    row_list = []
-    for key in tokens_dict.keys():
-        row_list.append(key)
-        for file_index in range(len(list_of_names)):
-            doc_count_dict = dict_list[file_index]
-            current_file = list_of_names[file_index]
-            current_token_list = token_lists[file_index]
-
-            word_count = word_counter(current_token_list,key)
-            doc_count_dict[key] = word_count
-            dict_list.append(doc_count_dict)
-            total_token_counter[file_index] += word_count
-
-            old_list = data.get(current_file)
-            old_list.append(word_count)
-            data[current_file] = old_list
-
-    for key in tokens_dict.keys():
-        for file_index in range(len(list_of_names)):
-            current_file = list_of_names[file_index]
-            old_list = result.get(current_file)
-
-            total_token_file_count = total_token_counter[file_index]
-            current_token_file_dict = dict_list[file_index]
-            current_token_file_count = current_token_file_dict.get(key)
-            token_fraction_in_file = current_token_file_count/total_token_file_count
-
-            sum_of_all_tokens = sum(total_token_counter)
-            list_of_key_values = []
-            
-            for file_id in range(len(list_of_names)):
-                current_dict = dict_list[file_id]
-                current_value = current_dict.get(key)
-                list_of_key_values.append(current_value)
-            
-            sum_of_key_tokens = sum(list_of_key_values)
-
-            try: 
-                log_of_total = math.log(sum_of_all_tokens/sum_of_key_tokens)
-            except ZeroDivisionError:
-                log_of_total = 0
-            
-            tf_idf = token_fraction_in_file*log_of_total
-            old_list.append(tf_idf)
-            result[current_file] = old_list
-    
-    df = pd.DataFrame(result, index=row_list)
-    return df 
-
+    dtm = document_term_matrix(token_lists, tokens_dict)
+    return matrix_to_df(tf_idf_matrix(dtm), tokens_dict, list_of_names)
@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bagofwords import stream_bow, update_index
+from nlp import file_merger, group_encoder, load_bow, tf_idf_calc
+
+
+def write_corpus(tmp_path, seed, num_files=3):
+    """
+    Schrijf een paar kleine tekstbestanden met willekeurige woorden; het laatste woord van elk bestand
+    komt verder nergens voor, zodat een pad dat dat woord overslaat een andere matrix geeft.
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefgh"
+    files = []
+    for i in range(num_files):
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(20, 60))]
+        words.append("zzq" * (i + 1))
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(" ".join(words) + "\n", encoding="utf-8")
+        files.append(str(path))
+    return files
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_learned_vocabulary_path(tmp_path, seed):
+    files = write_corpus(tmp_path, seed)
+    max_tokens, min_freq = 40, 2
+
+    # standaardpad van bagofwords: BPE leren op alle woorden en per document terugsplitsen
+    merged_words, len_of_files = file_merger(files)
+    token_lists, token_dict = group_encoder(max_tokens, min_freq, merged_words, len_of_files)
+    expected = tf_idf_calc(token_lists, token_dict, files)
+
+    # --stream leert dezelfde vocabulaire en slaat die op als .encb, --index gebruikt die vocabulaire
+    stream_file = str(tmp_path / "stream.bowb")
+    stream_bow(files, max_tokens, min_freq, "tfidf", "count", 1, stream_file)
+    index = update_index(files, str(tmp_path / "docs.tfidx"), str(tmp_path / "stream.encb"))
+
+    assert index.tokens_dict == token_dict
+    pd.testing.assert_frame_equal(index.to_df(), expected, check_exact=True)
+
+    streamed, rows, columns = load_bow(stream_file)
+    assert rows == files
+    assert columns == list(token_dict.values())
+    np.testing.assert_array_equal(streamed.toarray().T, expected.to_numpy())
@@ -0,0 +1,84 @@
+import random
+from collections import Counter
+
+import pytest
+
+from nlp import Tokenizer, encoder, get_pairs, incremental_encoder
+
+
+def random_words(seed):
+    """
+    Willekeurig corpus met een klein alfabet en herhaalde woorden, zodat er genoeg paren samengevoegd
+    worden en dezelfde woorden vaak terugkomen.
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefg"[:rng.randint(2, 7)]
+    types = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))) for _ in range(rng.randint(1, 40))]
+    return [rng.choice(types) for _ in range(rng.randint(1, 300))]
+
+
+def settings(seed):
+    rng = random.Random(seed)
+    return rng.randint(7, 60), rng.randint(1, 4)
+
+
+def reference_encoding(words, max_tokens, min_freq, vocab_size):
+    """
+    De uitkomst van encoder. encoder blijft hangen als er geen paar min_freq keer voorkomt voordat
+    max_tokens bereikt is, daarom wordt max_tokens verlaagd tot vocab_size (waar incremental_encoder
+    stopte) en gecontroleerd dat encoder daar ook echt niets meer kan samenvoegen.
+    """
+    expected_tokens, expected_vocab = encoder(words, min(max_tokens, vocab_size), min_freq)
+    if vocab_size < max_tokens:
+        pairs = Counter(get_pairs(expected_tokens))
+        assert all(freq < min_freq for freq in pairs.values())
+    return expected_tokens, expected_vocab
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("word_types", [False, True])
+def test_incremental_encoder_matches_encoder(seed, word_types):
+    words = random_words(seed)
+    max_tokens, min_freq = settings(seed)
+
+    words_tokens, id_to_tok = incremental_encoder(words, max_tokens, min_freq, word_types=word_types)
+    expected_tokens, expected_vocab = reference_encoding(words, max_tokens, min_freq, len(id_to_tok))
+
+    assert id_to_tok == expected_vocab
+    assert [list(w) for w in words_tokens] == [list(w) for w in expected_tokens]
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("word_types", [False, True])
+def test_incremental_encoder_with_workers_matches_encoder(seed, word_types):
+    words = random_words(seed)
+    max_tokens, min_freq = settings(seed)
+
+    words_tokens, id_to_tok = incremental_encoder(words, max_tokens, min_freq, word_types=word_types, workers=3)
+    expected_tokens, expected_vocab = reference_encoding(words, max_tokens, min_freq, len(id_to_tok))
+
+    assert id_to_tok == expected_vocab
+    assert [list(w) for w in words_tokens] == [list(w) for w in expected_tokens]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_word_counter_matches_encoder_vocabulary(seed):
+    # een Counter van woorden (zoals word_type_counter) leert dezelfde vocabulaire
+    words = random_words(seed)
+    max_tokens, min_freq = settings(seed)
+
+    _, id_to_tok = incremental_encoder(Counter(words), max_tokens, min_freq)
+    _, expected_vocab = reference_encoding(words, max_tokens, min_freq, len(id_to_tok))
+
+    assert id_to_tok == expected_vocab
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_merges_tokenizer_reproduces_training(seed):
+    words = random_words(seed)
+    max_tokens, min_freq = settings(seed)
+    words_tokens, id_to_tok, merges = incremental_encoder(words, max_tokens, min_freq, return_merges=True)
+
+    tokenizer = Tokenizer(id_to_tok, merges, strategy="merges")
+
+    assert [tokenizer.tokenize_word(w) for w in words] == [list(w) for w in words_tokens]
@@ -5,34 +5,55 @@ Usage:
   python tokenizer.py learn <txt_file> [max_tokens] [min_freq]
   python tokenizer.py tokenize <txt_file> <enc_file>
   python tokenizer.py decode <tok_file> <enc_file>
+  python tokenizer.py convert <tok_file|enc_file>
 
 Modes:
   learn
     Leest een .txt tekstbestand in en leert een Byte-Pair Encoding (BPE).
-    De encoding wordt opgeslagen in een .enc bestand.
+    De encoding wordt opgeslagen in een .enc bestand, de merge-rangen in een .merges bestand.
 
   tokenize
     Zet een .txt bestand om naar tokens met een gegeven .enc bestand.
-    Output wordt opgeslagen als .tok.
+    Output wordt opgeslagen als .tok, het bestand wordt in stukken gelezen en geschreven. Met --strategy kan gekozen worden tussen greedy longest match
+    en het opnieuw toepassen van de merges (standaard als er een .merges bestand is).
+    Met --workers wordt het bestand in stukken verdeeld en met meerdere processen getokenized.
 
   decode
     Zet een .tok bestand terug om naar leesbare tekst met behulp van een .enc bestand.
 
+  convert
+    Zet een .tok bestand om naar het binaire formaat (.tokb) of andersom. Het binaire formaat
+    (zie nlp.save_tok_bin) kan met numpy.memmap geopend worden zonder de tekst te parsen.
+    Een .enc bestand wordt omgezet naar een binaire .encb vocabulaire (zie nlp.save_vocab) of andersom.
+
 """
 import argparse
 import os
+from multiprocessing import Pool
 
 # Importeer algemene NLP-functionaliteit
-from nlp import filereader, encoder, load_enc, decode
+from nlp import (filereader, iter_words, byte_shards, read_words_range, incremental_encoder, load_enc, decode,
+                 Tokenizer, merges_path, TokBinWriter, save_tok_bin, load_tok_bin, is_tok_bin, tok_text_to_bin,
+                 tok_bin_to_text, save_vocab, load_vocab, is_enc_bin)
 
-def save_enc(id_to_tok, input_file):
+def save_enc(id_to_tok, input_file, merges=None, fmt="text"):
     """
     Sla de BPE-encoding op in een .enc bestand met zelfde naam als gebruikte txt bestand.
+    Als merges gegeven zijn worden de merge-rangen opgeslagen in een .merges bestand ernaast.
+    Met fmt 'bin' wordt alles (ook de trie van de tokenizer) in één binair .encb bestand opgeslagen.
 
     Parameters:
         id_to_tok : dict van token-ID met token-inhoud
         input_file : oorspronkelijke inputbestand, wordt gebruikt om de .enc bestandsnaam te maken
+        merges : dict van token-paar:token-ID van het samengevoegde token (optioneel)
+        fmt : 'text' of 'bin'
     """
+    if fmt == "bin":
+        path = output_path(input_file, ".encb")
+        save_vocab(path, id_to_tok, merges)
+        print("Encoding saved:", path)
+        return
+
     # Bepaal de map waarin dit script staat
     base = os.path.dirname(os.path.abspath(__file__))
     # Maak de bestandsnaam voor het .enc bestand op basis van de input_file
@@ -46,16 +67,37 @@ def save_enc(id_to_tok, input_file):
 
     print("Encoding saved:", path)
 
+    if merges is not None:
+        # schrijf de merges op volgorde van rang: token id en het paar waaruit het is samengevoegd
+        with open(merges_path(path), "w", encoding="utf-8") as f:
+            for (left, right), k in sorted(merges.items(), key=lambda item: item[1]):
+                f.write(f"{k}:{left} {right}\n")
+        print("Merges saved:", merges_path(path))
+
 
-def save_tok(words_tokens, input_file):
+def output_path(input_file, extension):
     """
-    Sla de getokenizeerde woorden op in een .tok bestand.
+    Maak het pad van een outputbestand in de map van dit script, met dezelfde naam als het inputbestand
+    maar met de gegeven extensie.
     """
     # Bepaal de map waarin dit script staat
     base = os.path.dirname(os.path.abspath(__file__))
+    filename = os.path.splitext(os.path.basename(input_file))[0] + extension
+    return os.path.join(base, filename)
+
+
+def save_tok(words_tokens, input_file, fmt="text"):
+    """
+    Sla de getokenizeerde woorden op in een .tok bestand, of met fmt 'bin' in een binair .tokb bestand.
+    """
+    if fmt == "bin":
+        path = output_path(input_file, ".tokb")
+        save_tok_bin(words_tokens, path)
+        print("Tokens saved:", path)
+        return
+
     # Maak de bestandsnaam voor het .tok bestand op basis van de input_file
-    filename = os.path.splitext(os.path.basename(input_file))[0] + ".tok"
-    path = os.path.join(base, filename)
+    path = output_path(input_file, ".tok")
 
     with open(path, "w", encoding="utf-8") as f:
         for w in words_tokens:
@@ -63,6 +105,153 @@ def save_tok(words_tokens, input_file):
 
     print("Tokens saved:", path)
 
+
+def stream_tok(tokenizer, input_file, chunk_size=1 << 20, fmt="text"):
+    """
+    Tokenize een tekstbestand in stukken en schrijf de tokens per woord direct naar een .tok bestand
+    (of .tokb met fmt 'bin'), zodat ook bestanden die niet in het geheugen passen getokenized kunnen worden.
+    De output is gelijk aan die van save_tok na het tokenizen van het hele bestand.
+
+    Parameters:
+        tokenizer : Tokenizer met de vocabulaire
+        input_file : tekstbestand, wordt ook gebruikt om de .tok bestandsnaam te maken
+        chunk_size : aantal karakters dat per keer gelezen wordt
+        fmt : 'text' of 'bin'
+    """
+    if fmt == "bin":
+        path = output_path(input_file, ".tokb")
+        with TokBinWriter(path, max(tokenizer.id_to_tok)) as writer:
+            for w in iter_words(input_file, chunk_size):
+                writer.write_word(tokenizer.tokenize_word(w))
+    else:
+        path = output_path(input_file, ".tok")
+        with open(path, "w", encoding="utf-8") as f:
+            for w in iter_words(input_file, chunk_size):
+                f.write(" ".join(map(str, tokenizer.tokenize_word(w))) + "\n")
+
+    print("Tokens saved:", path)
+
+# Tokenizer per workerproces, wordt één keer geladen door init_worker
+worker_tokenizer = None
+
+
+def init_worker(enc_file, strategy, cache_size):
+    """
+    Laad de vocabulaire één keer per workerproces.
+    """
+    global worker_tokenizer
+    worker_tokenizer = Tokenizer.from_enc(enc_file, strategy, cache_size)
+
+
+def tokenize_shard(shard):
+    """
+    Tokenize één byte range van het inputbestand in een workerproces.
+
+    Parameters:
+        shard : tuple van (inputbestand, start, eind, fmt)
+
+    Returns:
+        result : de .tok regels van dit stuk, of bij fmt 'bin' een lijst van token-ID's per woord
+        hits, misses : cache hits en misses van dit stuk
+    """
+    input_file, start, end, fmt = shard
+    hits = worker_tokenizer.cache_hits
+    misses = worker_tokenizer.cache_misses
+    words = read_words_range(input_file, start, end)
+    if fmt == "bin":
+        result = [worker_tokenizer.tokenize_word(w) for w in words]
+    else:
+        result = "".join(" ".join(map(str, worker_tokenizer.tokenize_word(w))) + "\n" for w in words)
+    return result, worker_tokenizer.cache_hits - hits, worker_tokenizer.cache_misses - misses
+
+
+def parallel_tok(enc_file, input_file, workers, strategy="auto", cache_size=10000, fmt="text",
+                 shard_size=1 << 24):
+    """
+    Tokenize een tekstbestand met meerdere processen. Het bestand wordt op witruimte in byte ranges
+    verdeeld, elk stuk wordt in een worker getokenized en de stukken worden op volgorde naar het
+    .tok bestand geschreven, zodat de output gelijk is aan die van stream_tok. Als er onderweg iets
+    misgaat wordt er geen (half) outputbestand achtergelaten.
+
+    Parameters:
+        enc_file : pad naar het .enc bestand
+        input_file : tekstbestand, wordt ook gebruikt om de .tok bestandsnaam te maken
+        workers : aantal processen
+        strategy : manier van tokenizen, zie Tokenizer.from_enc
+        cache_size : grootte van de woordcache per worker
+        fmt : 'text' of 'bin'
+        shard_size : ongeveer het aantal bytes per stuk (--chunk_size), een worker houdt één stuk in het geheugen
+
+    Returns:
+        hits, misses : totaal aantal cache hits en misses van alle workers
+    """
+    # Minstens een paar stukken per worker, zodat alle workers bezig blijven
+    num_shards = max(workers * 4, os.path.getsize(input_file) // shard_size + 1)
+    shards = [(input_file, start, end, fmt) for start, end in byte_shards(input_file, num_shards)]
+
+    path = output_path(input_file, ".tokb" if fmt == "bin" else ".tok")
+    max_id = max(load_enc(enc_file)) if fmt == "bin" else None
+
+    hits = misses = 0
+    # eerst de pool, pas daarna het outputbestand: als de pool niet start is er nog niets geschreven
+    with Pool(workers, initializer=init_worker, initargs=(enc_file, strategy, cache_size)) as pool:
+        if fmt == "bin":
+            # TokBinWriter schrijft bij een exceptie niets (zie TokBinWriter.discard)
+            with TokBinWriter(path, max_id) as writer:
+                # imap geeft de resultaten terug in de volgorde van de stukken
+                for result, shard_hits, shard_misses in pool.imap(tokenize_shard, shards):
+                    writer.write_words(result)
+                    hits += shard_hits
+                    misses += shard_misses
+        else:
+            try:
+                with open(path, "w", encoding="utf-8") as writer:
+                    for result, shard_hits, shard_misses in pool.imap(tokenize_shard, shards):
+                        writer.write(result)
+                        hits += shard_hits
+                        misses += shard_misses
+            except BaseException:
+                # geen half .tok bestand achterlaten
+                os.remove(path)
+                raise
+
+    print("Tokens saved:", path)
+    return hits, misses
+
+
+def convert_tok(input_file):
+    """
+    Zet een .tok bestand om naar het andere formaat: tekst naar binair (.tokb) en binair naar tekst (.tok).
+    """
+    if is_tok_bin(input_file):
+        path = output_path(input_file, ".tok")
+        tok_bin_to_text(input_file, path)
+    else:
+        path = output_path(input_file, ".tokb")
+        tok_text_to_bin(input_file, path)
+    print("Tokens saved:", path)
+
+
+def convert_enc(input_file):
+    """
+    Zet een encodingbestand om naar het andere formaat: .enc (met .merges als die er is) naar binair
+    (.encb) en binair naar .enc en .merges.
+    """
+    vocab = load_vocab(input_file)
+    if is_enc_bin(input_file):
+        save_enc(vocab["id_to_tok"], input_file, vocab["merges"])
+    else:
+        save_enc(vocab["id_to_tok"], input_file, vocab["merges"], fmt="bin")
+
+
+def print_cache_stats(hits, misses):
+    """
+    Print hoe vaak de woordcache van de tokenizer geraakt is.
+    """
+    total = hits + misses
+    hit_rate = hits / total * 100 if total else 0
+    print(f"Cache hits: {hits}, misses: {misses} ({hit_rate:.1f}% hits)")
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Tokenizer: learn BPE, tokenize tekst, decode tokens",
@@ -71,19 +260,19 @@ def parse_args():
 
     parser.add_argument(
         "mode",
-        choices=["learn", "tokenize", "decode"],
-        help="Kies een operatie: learn, tokenize of decode"
+        choices=["learn", "tokenize", "decode", "convert"],
+        help="Kies een operatie: learn, tokenize, decode of convert"
     )
 
     parser.add_argument(
         "-i", "--input",
-        help="Inputbestand (.txt voor learn/tokenize, .tok voor decode)"
+        help="Inputbestand (.txt voor learn/tokenize, .tok/.tokb voor decode, .tok/.tokb/.enc/.encb voor convert)"
     )
 
     parser.add_argument(
         "-e", "--enc",
         type=str,
-        help="Encodingbestand (.enc) – verplicht voor tokenize en decode"
+        help="Encodingbestand (.enc of .encb) – verplicht voor tokenize en decode"
     )
 
     parser.add_argument(
@@ -100,6 +289,49 @@ def parse_args():
         help="Minimale frequentie voor merges (alleen voor learn)"
     )
 
+    parser.add_argument(
+        "-s", "--strategy",
+        choices=["auto", "greedy", "merges"],
+        default="auto",
+        help="Manier van tokenizen (alleen voor tokenize): greedy longest match of de geleerde merges\n"
+             "op volgorde van rang. auto gebruikt merges als er een .merges bestand bij de .enc staat."
+    )
+
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=10000,
+        help="Aantal woorden waarvan de tokens bewaard worden (alleen voor tokenize), 0 zet de cache uit"
+    )
+
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=1 << 20,
+        help="Aantal karakters dat per keer van de input gelezen wordt (alleen voor tokenize), met --workers "
+             "ongeveer het aantal bytes per stuk dat een worker tokenized"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=1,
+        help="Aantal processen voor learn en tokenize"
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["text", "bin"],
+        default="text",
+        help="Outputformaat voor learn en tokenize: tekst (.enc/.tok) of binair (.encb/.tokb)"
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print hits en misses van de woordcache na het tokenizen"
+    )
+
     return parser.parse_args()
 
 
@@ -112,8 +344,9 @@ def main():
     if mode == "learn":
 
         words = filereader(input_file)
-        _, id_to_tok = encoder(words, max_tokens=args.max_tokens, min_freq=args.min_freq)
-        save_enc(id_to_tok, input_file)
+        _, id_to_tok, merges = incremental_encoder(words, max_tokens=args.max_tokens, min_freq=args.min_freq,
+                                                   return_merges=True, workers=args.workers)
+        save_enc(id_to_tok, input_file, merges, args.format)
         print(f"BPE learned! Max tokens respected: {len(id_to_tok)}")
 
     elif mode == "tokenize":
@@ -122,30 +355,18 @@ def main():
             return
 
         enc_file = args.enc
-        words = filereader(input_file)
-        id_to_tok = load_enc(enc_file)
-        tok_to_id = {v: k for k, v in id_to_tok.items()}
-
-        words_tokens = []
-        for w in words:
-            i = 0
-            w_tok = []
-            while i < len(w):
-                match = None
-                for l in range(len(w) - i, 0, -1):
-                    sub = w[i:i + l]
-                    if sub in tok_to_id:
-                        match = sub
-                        break
-                if match:
-                    w_tok.append(tok_to_id[match])
-                    i += len(match)
-                else:
-                    w_tok.append(tok_to_id[w[i]])
-                    i += 1
-            words_tokens.append(w_tok)
-
-        save_tok(words_tokens, input_file)
+
+        if args.workers > 1:
+            hits, misses = parallel_tok(enc_file, input_file, args.workers, args.strategy, args.cache_size,
+                                        args.format, args.chunk_size)
+        else:
+            tokenizer = Tokenizer.from_enc(enc_file, args.strategy, args.cache_size)
+            # Lees en schrijf in stukken, zodat het hele bestand nooit in het geheugen hoeft
+            stream_tok(tokenizer, input_file, args.chunk_size, args.format)
+            hits, misses = tokenizer.cache_hits, tokenizer.cache_misses
+
+        if args.stats:
+            print_cache_stats(hits, misses)
 
     elif mode == "decode":
         if not args.enc:
@@ -155,10 +376,13 @@ def main():
         enc_file = args.enc
         id_to_tok = load_enc(enc_file)
 
-        tokens_list = []
-        with open(input_file, "r", encoding="utf-8") as f:
-            for line in f:
-                tokens_list.append([int(t) for t in line.strip().split()])
+        if is_tok_bin(input_file):
+            tokens_list = load_tok_bin(input_file).tolist()
+        else:
+            tokens_list = []
+            with open(input_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    tokens_list.append([int(t) for t in line.strip().split()])
 
         text = decode(tokens_list, id_to_tok)
 
@@ -171,5 +395,11 @@ def main():
 
         print("Decoded text saved:", path)
 
+    elif mode == "convert":
+        if is_enc_bin(input_file) or input_file.endswith(".enc"):
+            convert_enc(input_file)
+        else:
+            convert_tok(input_file)
+
 if __name__ == "__main__":
     main()